@@ -7,8 +7,51 @@ if "bpy" in locals():
     import importlib
     if "actions_mixer" in locals():
         importlib.reload(actions_mixer)
+    # Helper modules first, pixelart_renderer imports from them
+    if "atlas_layout" in locals():
+        importlib.reload(atlas_layout)
+    if "frame_dedup" in locals():
+        importlib.reload(frame_dedup)
+    if "atlas_packing" in locals():
+        importlib.reload(atlas_packing)
+    if "png_stream" in locals():
+        importlib.reload(png_stream)
+    if "sheet_export" in locals():
+        importlib.reload(sheet_export)
+    if "strip_store" in locals():
+        importlib.reload(strip_store)
+    if "render_farm" in locals():
+        importlib.reload(render_farm)
+    if "render_cache" in locals():
+        importlib.reload(render_cache)
+    if "rotation_symmetry" in locals():
+        importlib.reload(rotation_symmetry)
+    if "render_border" in locals():
+        importlib.reload(render_border)
+    if "frame_capture" in locals():
+        importlib.reload(frame_capture)
+    if "render_checkpoint" in locals():
+        importlib.reload(render_checkpoint)
+    if "node_toggles" in locals():
+        importlib.reload(node_toggles)
+    if "tile_batch" in locals():
+        importlib.reload(tile_batch)
+    if "stage_layers" in locals():
+        importlib.reload(stage_layers)
+    if "multiview" in locals():
+        importlib.reload(multiview)
+    if "render_schedule" in locals():
+        importlib.reload(render_schedule)
+    if "visibility_layers" in locals():
+        importlib.reload(visibility_layers)
+    if "scene_state" in locals():
+        importlib.reload(scene_state)
+    if "character_batch" in locals():
+        importlib.reload(character_batch)
     if "pixelart_renderer" in locals():
         importlib.reload(pixelart_renderer)
+    if "batch_cli" in locals():
+        importlib.reload(batch_cli)
     if "tile_mixer" in locals():
         importlib.reload(tile_mixer)
     if "environment_helper_utils" in locals():
@@ -19,6 +62,27 @@ from . import actions_mixer
 from . import pixelart_renderer
 from . import tile_mixer
 from . import environment_helper_utils
+from . import frame_capture
+from . import atlas_layout
+from . import frame_dedup
+from . import atlas_packing
+from . import png_stream
+from . import sheet_export
+from . import strip_store
+from . import render_farm
+from . import render_cache
+from . import rotation_symmetry
+from . import render_border
+from . import render_checkpoint
+from . import node_toggles
+from . import tile_batch
+from . import stage_layers
+from . import multiview
+from . import render_schedule
+from . import visibility_layers
+from . import scene_state
+from . import character_batch
+from . import batch_cli
 
 def register():
     actions_mixer.register()
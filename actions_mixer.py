@@ -6,6 +6,10 @@ def register():
     bpy.utils.register_class(ActionsMixerRow)
     bpy.utils.register_class(ActionsMixerAddRow)
     bpy.utils.register_class(ActionsMixerRemoveRow)
+    bpy.utils.register_class(CharacterBatchRow)
+    bpy.utils.register_class(CharacterBatchAdd)
+    bpy.utils.register_class(CharacterBatchRemove)
+    bpy.utils.register_class(CharacterBatchLoad)
 
     # TODO: Change name!
     bpy.types.Scene.ActionsPropColl = bpy.props.CollectionProperty(type=ActionsMixerRow)
@@ -30,9 +34,14 @@ def register():
         description="",
         default=False
     )
+    bpy.types.Scene.CharacterBatchColl = bpy.props.CollectionProperty(type=CharacterBatchRow)
 
 
 def unregister():
+    bpy.utils.unregister_class(CharacterBatchLoad)
+    bpy.utils.unregister_class(CharacterBatchRemove)
+    bpy.utils.unregister_class(CharacterBatchAdd)
+    bpy.utils.unregister_class(CharacterBatchRow)
     bpy.utils.unregister_class(ActionsMixerPanel)
     bpy.utils.unregister_class(ActionsMixerRow)
     bpy.utils.unregister_class(ActionsMixerAddRow)
@@ -44,9 +53,16 @@ def _get_actions_names(_1, _2):
     action_names.insert(0, ("None", "None", ""))
     return action_names
 
-def _get_prop_names(_1, _2):
+def _row_prop_collection(row):
+    # Rows of character batch entries list props from prop collection of their entry
+    path = row.path_from_id()
+    if path.startswith("CharacterBatchColl["):
+        return row.id_data.path_resolve(path[:path.index("]") + 1]).prop_collection
+    return bpy.context.scene.PropCollectionPointer
+
+def _get_prop_names(row, _2):
     return_names = None
-    prop_collection = bpy.context.scene.PropCollectionPointer
+    prop_collection = _row_prop_collection(row)
     if prop_collection:
         return_names = [(x, x, "") for x in prop_collection.objects.keys()]
         return_names.insert(0, ("None", "None", ""))
@@ -73,6 +89,35 @@ class ActionsMixerRow(bpy.types.PropertyGroup):
         default=False
     )
 
+    is_mirror_symmetric: bpy.props.BoolProperty(
+        name="", # Name is described in label above
+        description="Left and right side look the same in this action, so half of rotations can be mirrored instead of rendered. Used only when character mirror axis is set",
+        default=False
+    )
+
+
+ACTIONS_MIXER_ROW_FIELDS = ("character_action_name", "prop_for_action_name", "is_attack_render", "is_mirror_symmetric")
+
+def copy_actions_rows(source, target):
+    # Prop collection of target has to be set already, prop names are checked against it
+    target.clear()
+    for source_row in source:
+        target_row = target.add()
+        for field in ACTIONS_MIXER_ROW_FIELDS:
+            setattr(target_row, field, getattr(source_row, field))
+
+
+class CharacterBatchRow(bpy.types.PropertyGroup):
+    enabled: bpy.props.BoolProperty(
+        name="",
+        description="Render this character when character batch is enabled",
+        default=True
+    )
+    character: bpy.props.PointerProperty(type=bpy.types.Object)
+    prop_collection: bpy.props.PointerProperty(type=bpy.types.Collection)
+    wearable_collection: bpy.props.PointerProperty(type=bpy.types.Collection)
+    actions: bpy.props.CollectionProperty(type=ActionsMixerRow)
+
 
 class ActionsMixerPanel(bpy.types.Panel):
     bl_label = "Actions Mixer Panel"
@@ -86,23 +131,27 @@ class ActionsMixerPanel(bpy.types.Panel):
         layout = self.layout
         ActionsPropColl = context.scene.ActionsPropColl
 
-        grid = layout.grid_flow(row_major=True, columns=3, align=True)
+        grid = layout.grid_flow(row_major=True, columns=4, align=True)
         grid.label(text="Object name")
         grid.label(text="Props collection name (Cant be null)")
         grid.label(text="")
+        grid.label(text="")
         grid.prop(context.scene, "CharacterPointer", text="")
         grid.prop(context.scene, "PropCollectionPointer", text="")
         row = layout.row()
         row.operator(ActionsMixerAddRow.bl_idname, text="Add row", icon="ADD")
         row.operator(ActionsMixerRemoveRow.bl_idname, text="Remove row", icon="REMOVE")
         grid.label(text="")
+        grid.label(text="")
         grid.label(text="Action name")
         grid.label(text="Prop name")
         grid.label(text="Is attack animation")
+        grid.label(text="Is mirror symmetric")
         for member in ActionsPropColl:
             grid.prop(member, "character_action_name")
             grid.prop(member, "prop_for_action_name")
             grid.prop(member, "is_attack_render")
+            grid.prop(member, "is_mirror_symmetric")
 
         layout.prop(context.scene, "TripleAttackAnimationFrames", text="Triple Attack Animation Frames") 
         layout.label(text="Wearable collection name")
@@ -112,6 +161,15 @@ class ActionsMixerPanel(bpy.types.Panel):
         layout.label(text="Render helper file to explain animation parameters")
         layout.prop(context.scene, "OutputJsonExplainingRender", text="")
 
+        layout.label(text="Character batch")
+        layout.operator(CharacterBatchAdd.bl_idname, text="Add character above to batch", icon="ADD")
+        for index, batch_row in enumerate(context.scene.CharacterBatchColl):
+            row = layout.row(align=True)
+            row.prop(batch_row, "enabled")
+            row.label(text=f"{batch_row.character.name if batch_row.character != None else 'None'} ({len(batch_row.actions)} actions)")
+            row.operator(CharacterBatchLoad.bl_idname, text="", icon="IMPORT").index = index
+            row.operator(CharacterBatchRemove.bl_idname, text="", icon="REMOVE").index = index
+
 
 class ActionsMixerAddRow(bpy.types.Operator):
     bl_idname = "actions_mixer.add_row"
@@ -134,4 +192,57 @@ class ActionsMixerRemoveRow(bpy.types.Operator):
     def execute(self, context):
         ActionsPropColl = context.scene.ActionsPropColl
         ActionsPropColl.remove(len(ActionsPropColl) - 1)
-        return {'FINISHED'}
\ No newline at end of file
+        return {'FINISHED'}
+
+
+class CharacterBatchAdd(bpy.types.Operator):
+    """
+    Stores character, actions, props and wearables currently set in the panel as new character batch entry
+    """
+    bl_idname = "actions_mixer.character_batch_add"
+    bl_label = "Add Character To Batch"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        scene = context.scene
+        if scene.CharacterPointer == None:
+            self.report({"ERROR"}, "Set object to render first")
+            return {'CANCELLED'}
+        batch_row = scene.CharacterBatchColl.add()
+        batch_row.character = scene.CharacterPointer
+        batch_row.prop_collection = scene.PropCollectionPointer
+        batch_row.wearable_collection = scene.WearableCollectionPointer
+        copy_actions_rows(scene.ActionsPropColl, batch_row.actions)
+        return {'FINISHED'}
+
+
+class CharacterBatchRemove(bpy.types.Operator):
+    bl_idname = "actions_mixer.character_batch_remove"
+    bl_label = "Remove Character From Batch"
+    bl_options = {'REGISTER'}
+
+    index: bpy.props.IntProperty()
+
+    def execute(self, context):
+        context.scene.CharacterBatchColl.remove(self.index)
+        return {'FINISHED'}
+
+
+class CharacterBatchLoad(bpy.types.Operator):
+    """
+    Loads character batch entry back to the panel so it can be edited and added again
+    """
+    bl_idname = "actions_mixer.character_batch_load"
+    bl_label = "Load Character From Batch"
+    bl_options = {'REGISTER'}
+
+    index: bpy.props.IntProperty()
+
+    def execute(self, context):
+        scene = context.scene
+        batch_row = scene.CharacterBatchColl[self.index]
+        scene.CharacterPointer = batch_row.character
+        scene.PropCollectionPointer = batch_row.prop_collection
+        scene.WearableCollectionPointer = batch_row.wearable_collection
+        copy_actions_rows(batch_row.actions, scene.ActionsPropColl)
+        return {'FINISHED'}
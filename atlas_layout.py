@@ -0,0 +1,93 @@
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Sprite sheet layout
+# ------------------------------------------------------------------------
+
+def compose_band(strips, rects, top, bottom, width, depth, dtype):
+    """
+    Sheet rows top to bottom. rects are (sheet x, sheet y, width, height, action name, strip x, strip y),
+    only parts of rects overlapping the band are copied so sheet can be built band by band.
+    """
+    band = np.zeros((bottom - top, width, depth), dtype)
+    for x, y, rect_width, rect_height, action_name, strip_x, strip_y in rects:
+        band_top = max(y, top)
+        band_bottom = min(y + rect_height, bottom)
+        if band_top >= band_bottom:
+            continue
+        strip = np.asarray(strips[action_name])
+        band[band_top - top:band_bottom - top, x:x + rect_width] = strip[strip_y + band_top - y:strip_y + band_bottom - y, strip_x:strip_x + rect_width]
+    return band
+
+
+class StripPlacement:
+    def __init__(self, x, y, width, height, index_x, index_y):
+        # Pixel position of strip top left corner in the sheet
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        # Column and row of the strip, this is what ends up in json
+        self.index_x = index_x
+        self.index_y = index_y
+
+
+class AtlasLayout:
+    """
+    Places every action strip of one sheet in a single pass. Strips are stacked vertically
+    in columns of max strip width, new column is started when column would exceed max_length.
+    Sheet is allocated once and every strip is copied exactly once.
+    """
+
+    def __init__(self, strips, max_length):
+        self.max_length = max_length
+        self.placements = {}
+        self.cell_width = 0
+        self.width = 0
+        self.height = 0
+        self.depth = 4
+        self.dtype = np.uint8
+
+        action_names = [x for x in strips.keys() if x != 'None']
+        for action_name in action_names:
+            strip = np.asarray(strips[action_name])
+            self.cell_width = max(self.cell_width, strip.shape[1])
+            self.depth = strip.shape[2]
+            self.dtype = strip.dtype
+
+        index_x = 0
+        index_y = 0
+        y = 0
+        for action_name in action_names:
+            height, width = np.asarray(strips[action_name]).shape[:2]
+            # Never leave empty column, even if single strip is longer than the limit
+            if index_y > 0 and y + height > max_length:
+                index_x += 1
+                index_y = 0
+                y = 0
+            self.placements[action_name] = StripPlacement(index_x * self.cell_width, y, width, height, index_x, index_y)
+            y += height
+            index_y += 1
+            self.height = max(self.height, y)
+        if len(self.placements) > 0:
+            self.width = (index_x + 1) * self.cell_width
+
+    @property
+    def action_names(self):
+        return list(self.placements.keys())
+
+    def sheet_json(self):
+        return {}
+
+    def action_json(self, action_name):
+        placement = self.placements[action_name]
+        return {"animation_index_x": placement.index_x, "animation_index_y": placement.index_y}
+
+    def rects(self):
+        return [(x.x, x.y, x.width, x.height, action_name, 0, 0) for action_name, x in self.placements.items()]
+
+    def compose_rows(self, strips, top, bottom):
+        return compose_band(strips, self.rects(), top, bottom, self.width, self.depth, self.dtype)
+
+    def compose(self, strips):
+        return self.compose_rows(strips, 0, self.height)
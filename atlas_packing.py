@@ -0,0 +1,175 @@
+import hashlib
+import math
+import numpy as np
+
+from .atlas_layout import compose_band
+
+# ------------------------------------------------------------------------
+#   Tight packed sprite sheet layout
+# ------------------------------------------------------------------------
+
+def alpha_bounds(frame):
+    # (x, y, width, height) of pixels with non zero alpha, all zeros for fully transparent frame
+    alpha = frame[:, :, 3] if frame.shape[2] == 4 else frame.max(axis=2)
+    columns = np.flatnonzero(alpha.any(axis=0))
+    if len(columns) == 0:
+        return (0, 0, 0, 0)
+    rows = np.flatnonzero(alpha.any(axis=1))
+    return (int(columns[0]), int(rows[0]), int(columns[-1] - columns[0] + 1), int(rows[-1] - rows[0] + 1))
+
+
+class MaxRectsPacker:
+    """
+    MaxRects bin packing with bottom left rule into a bin of fixed width and unlimited height.
+    Free space is kept as list of maximal free rectangles, every placed rectangle splits
+    the free rectangles it overlaps and rectangles contained in others are pruned.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.height = 0
+        self.free_rects = [(0, 0, width, math.inf)]
+
+    def insert(self, width, height):
+        best = None
+        for free_x, free_y, free_width, free_height in self.free_rects:
+            if width <= free_width and height <= free_height:
+                score = (free_y + height, free_x)
+                if best == None or score < best[0]:
+                    best = (score, free_x, free_y)
+        if best == None:
+            raise ValueError(f"Rectangle {width}x{height} is wider than packing width {self.width}")
+        x, y = best[1], best[2]
+        self._split_free_rects(x, y, width, height)
+        self.height = max(self.height, y + height)
+        return x, y
+
+    def _split_free_rects(self, x, y, width, height):
+        split = []
+        for free in self.free_rects:
+            free_x, free_y, free_width, free_height = free
+            if x >= free_x + free_width or x + width <= free_x or y >= free_y + free_height or y + height <= free_y:
+                split.append(free)
+                continue
+            # Up to four maximal rectangles around the placed one
+            if x > free_x:
+                split.append((free_x, free_y, x - free_x, free_height))
+            if x + width < free_x + free_width:
+                split.append((x + width, free_y, free_x + free_width - x - width, free_height))
+            if y > free_y:
+                split.append((free_x, free_y, free_width, y - free_y))
+            if y + height < free_y + free_height:
+                split.append((free_x, y + height, free_width, free_y + free_height - y - height))
+        self.free_rects = [a for i, a in enumerate(split) if not any(i != j and self._contains(b, a) and (a != b or j < i) for j, b in enumerate(split))]
+
+    @staticmethod
+    def _contains(outer, inner):
+        return outer[0] <= inner[0] and outer[1] <= inner[1] and inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3]
+
+
+def pack_rects(sizes, max_length):
+    """
+    Packs (width, height) sizes, returns positions and sheet (width, height). Sheet width starts
+    close to a square and grows while sheet would be taller than max_length.
+    """
+    # Fully transparent frames take no space, they all point to the top left corner
+    order = sorted([i for i, (w, h) in enumerate(sizes) if w > 0 and h > 0], key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [(0, 0)] * len(sizes)
+    if len(order) == 0:
+        return positions, (1, 1)
+    area = sum(sizes[i][0] * sizes[i][1] for i in order)
+    widest = max(sizes[i][0] for i in order)
+    width = max(widest, math.ceil(math.sqrt(area)))
+    while True:
+        packer = MaxRectsPacker(width)
+        for index in order:
+            positions[index] = packer.insert(*sizes[index])
+        if packer.height <= max_length or width >= max(max_length, widest) or width >= area:
+            return positions, (width, packer.height)
+        width = min(max(max_length, widest), math.ceil(width * 1.25))
+
+
+class PackedLayout:
+    """
+    Sheet layout that trims every frame to its alpha bounding box and packs trimmed frames with MaxRects.
+    With dedup frames that are identical after trimming share one rect. Json gets every frame rect,
+    its offset inside the untrimmed frame and untrimmed size, actions get rows of frame indices.
+    Same interface as AtlasLayout.
+    """
+
+    def __init__(self, strips, max_length, frame_width, frame_height, dedup=False):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.depth = 4
+        self.dtype = np.uint8
+        # Every packed frame: (action name, x, y) of its trimmed pixels in the strip and (width, height)
+        self.sources = []
+        self.offsets = []
+        self.sequences = {}
+        self.frame_count = 0
+        digests = {}
+
+        for action_name in [x for x in strips.keys() if x != 'None']:
+            strip = np.asarray(strips[action_name])
+            height, width = strip.shape[:2]
+            if height % frame_height != 0 or width % frame_width != 0:
+                raise ValueError(f"Strip of {action_name} with shape {strip.shape} is not made of {frame_width}x{frame_height} frames")
+            self.depth = strip.shape[2]
+            self.dtype = strip.dtype
+            rows = []
+            for y in range(0, height, frame_height):
+                row = []
+                for x in range(0, width, frame_width):
+                    frame = strip[y:y + frame_height, x:x + frame_width]
+                    trim_x, trim_y, trim_width, trim_height = alpha_bounds(frame)
+                    trimmed = frame[trim_y:trim_y + trim_height, trim_x:trim_x + trim_width]
+                    source = (action_name, x + trim_x, y + trim_y, trim_width, trim_height)
+                    row.append(self._frame_index(digests, strips, trimmed, source, (trim_x, trim_y), dedup))
+                    self.frame_count += 1
+                rows.append(row)
+            self.sequences[action_name] = rows
+
+        positions, (self.width, self.height) = pack_rects([(x[3], x[4]) for x in self.sources], max_length)
+        self.positions = positions
+
+    def _frame_index(self, digests, strips, trimmed, source, offset, dedup):
+        if dedup:
+            digest = hashlib.blake2b(np.ascontiguousarray(trimmed).tobytes() + repr((offset, trimmed.shape)).encode(), digest_size=16).digest()
+            for index in digests.get(digest, []):
+                if self.offsets[index] == offset and np.array_equal(self._source_pixels(strips, index), trimmed):
+                    return index
+            digests.setdefault(digest, []).append(len(self.sources))
+        self.sources.append(source)
+        self.offsets.append(offset)
+        return len(self.sources) - 1
+
+    def _source_pixels(self, strips, index):
+        action_name, x, y, width, height = self.sources[index]
+        return np.asarray(strips[action_name])[y:y + height, x:x + width]
+
+    @property
+    def action_names(self):
+        return list(self.sequences.keys())
+
+    def sheet_json(self):
+        frames = []
+        for (_, _, _, width, height), (x, y), offset in zip(self.sources, self.positions, self.offsets):
+            frames.append({
+                "rect_px": [x, y, width, height],
+                "trim_offset_px": list(offset),
+                "source_size_px": [self.frame_width, self.frame_height],
+            })
+        return {"frames": frames}
+
+    def action_json(self, action_name):
+        return {"frame_indices": self.sequences[action_name]}
+
+    def rects(self):
+        # Fully transparent frames have nothing to copy
+        return [(x, y, width, height, action_name, strip_x, strip_y) for (action_name, strip_x, strip_y, width, height), (x, y) in zip(self.sources, self.positions) if width > 0]
+
+    def compose_rows(self, strips, top, bottom):
+        return compose_band(strips, self.rects(), top, bottom, self.width, self.depth, self.dtype)
+
+    def compose(self, strips):
+        return self.compose_rows(strips, 0, self.height)
@@ -0,0 +1,157 @@
+import bpy
+import json
+import os
+import sys
+import traceback
+
+from .pixelart_renderer import render_progress
+
+# ------------------------------------------------------------------------
+#   Headless batch render
+# ------------------------------------------------------------------------
+#
+# blender -b --python-expr "import importlib; importlib.import_module('<addon package>.batch_cli').main()" -- --job nightly.json
+#
+# Job file (JSON or TOML) is one job, list of jobs or {"jobs": [...]}. Every job may name a "blend"
+# to open (kept open for next jobs using the same file) and a "scene", "settings" are scene properties
+# set before render:
+#
+#   {
+#       "blend": "characters/knight.blend",
+#       "settings": {
+#           "CharacterPointer": "Knight",
+#           "CameraCollectionPointer": "Cameras",
+#           "MaxRenderLength": 16384,
+#           "EmetTool": {"output_directory": "/builds/knight", "selected_render": "0", "rotations": 8},
+#           "ActionsPropColl": [{"character_action_name": "Idle", "prop_for_action_name": "None"}]
+#       }
+#   }
+#
+# Property groups are dictionaries, object and collection pointers are datablock names, enums take
+# item identifiers, collection properties are lists of dictionaries replacing the current rows.
+# Settings are applied in listed order, so set PropCollectionPointer before ActionsPropColl rows naming props.
+# All jobs run in one Blender process.
+# Exit code is 0 when every job rendered, 1 when some job failed and 2 for invalid arguments or job file.
+
+EXIT_OK = 0
+EXIT_JOB_FAILED = 1
+EXIT_INVALID_JOB = 2
+
+
+class JobError(Exception):
+    pass
+
+
+def load_jobs(path):
+    with open(path, 'rb') as fp:
+        if path.lower().endswith(".toml"):
+            import tomllib
+            data = tomllib.load(fp)
+        else:
+            data = json.load(fp)
+    if isinstance(data, dict) and "jobs" in data.keys():
+        data = data["jobs"]
+    jobs = data if isinstance(data, list) else [data]
+    base_directory = os.path.dirname(os.path.abspath(path))
+    for job in jobs:
+        if not isinstance(job, dict):
+            raise JobError(f"Job in {path} is not a table: {job}")
+        if "blend" in job.keys():
+            job["blend"] = os.path.normpath(os.path.join(base_directory, job["blend"]))
+    return jobs
+
+
+# Pointer property type to bpy.data collection its datablocks are looked up in
+ID_COLLECTIONS = {
+    "Object": "objects",
+    "Collection": "collections",
+    "Material": "materials",
+    "Action": "actions",
+    "NodeTree": "node_groups",
+}
+
+
+def _find_datablock(fixed_type, name):
+    if fixed_type.identifier not in ID_COLLECTIONS.keys():
+        raise JobError(f"Pointers to {fixed_type.identifier} can't be set from job file")
+    return getattr(bpy.data, ID_COLLECTIONS[fixed_type.identifier]).get(name)
+
+
+def apply_settings(struct, settings, path="scene"):
+    for name, value in settings.items():
+        prop = struct.bl_rna.properties.get(name)
+        if prop == None:
+            raise JobError(f"{path} has no property {name}")
+        if prop.type == 'POINTER' and isinstance(getattr(struct, name), bpy.types.PropertyGroup):
+            apply_settings(getattr(struct, name), value, f"{path}.{name}")
+        elif prop.type == 'POINTER':
+            datablock = None
+            if value != None:
+                datablock = _find_datablock(prop.fixed_type, value)
+                if datablock == None:
+                    raise JobError(f"{path}.{name}: no {prop.fixed_type.identifier} named {value}")
+            setattr(struct, name, datablock)
+        elif prop.type == 'COLLECTION':
+            rows = getattr(struct, name)
+            rows.clear()
+            for index, row_settings in enumerate(value):
+                apply_settings(rows.add(), row_settings, f"{path}.{name}[{index}]")
+        else:
+            try:
+                setattr(struct, name, value)
+            except (TypeError, ValueError) as e:
+                raise JobError(f"{path}.{name}: {e}")
+
+
+def run_job(job):
+    blend = job.get("blend")
+    if blend != None and os.path.normcase(bpy.data.filepath) != os.path.normcase(blend):
+        if not os.path.exists(blend):
+            raise JobError(f"Blend file {blend} does not exist")
+        bpy.ops.wm.open_mainfile(filepath=blend)
+    scene = bpy.context.scene
+    if "scene" in job.keys():
+        scene = bpy.data.scenes.get(job["scene"])
+        if scene == None:
+            raise JobError(f"No scene named {job['scene']}")
+    apply_settings(scene, job.get("settings", {}))
+    with bpy.context.temp_override(scene=scene, view_layer=scene.view_layers[0]):
+        bpy.ops.emet.render_tiles_operator()
+    if render_progress["error"] != None:
+        raise RuntimeError(render_progress["error"])
+
+
+def main(argv=None):
+    if argv == None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    job_paths = [argv[i + 1] for i, x in enumerate(argv[:-1]) if x == "--job"]
+    fail_fast = "--fail-fast" in argv
+    if len(job_paths) == 0:
+        print("Usage: blender -b --python-expr \"...batch_cli').main()\" -- --job job.json [--job more.toml] [--fail-fast]")
+        sys.exit(EXIT_INVALID_JOB)
+
+    try:
+        jobs = []
+        for job_path in job_paths:
+            jobs.extend(load_jobs(job_path))
+    except (OSError, ValueError, JobError) as e:
+        print(f"Invalid job file: {e}")
+        sys.exit(EXIT_INVALID_JOB)
+
+    failed = []
+    for index, job in enumerate(jobs):
+        name = job.get("name", f"job {index}")
+        print(f"[{index + 1}/{len(jobs)}] Rendering {name}")
+        try:
+            run_job(job)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[{index + 1}/{len(jobs)}] {name} failed: {e}")
+            failed.append(name)
+            if fail_fast:
+                break
+    if len(failed) > 0:
+        print(f"Failed jobs: {', '.join(failed)}")
+        sys.exit(EXIT_JOB_FAILED)
+    print(f"All {len(jobs)} jobs rendered")
+    sys.exit(EXIT_OK)
@@ -0,0 +1,308 @@
+"""
+Micro benchmarks of the post processing path: frame decoding, strip padding, sheet layout and encoding, json.
+None of it needs Blender, addon modules are loaded straight from the repository without running __init__.py.
+
+    python benchmarks/post_processing.py                       # quick sweep, results to benchmark_results.json
+    python benchmarks/post_processing.py --sweep full --output nightly.json
+    python benchmarks/post_processing.py --compare baseline.json --threshold 1.25
+
+Every case reports best and median wall time, peak traced memory (NumPy allocations are traced too)
+and output bytes, the size of arrays and files the measured call produces.
+With --compare exit code is 1 when some case got slower than threshold times its baseline.
+"""
+
+import argparse
+import datetime
+import importlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import ModuleType, SimpleNamespace
+
+import cv2
+import numpy as np
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "emet_post_processing"
+
+SWEEPS = {
+    "quick": {
+        "rotations": [1, 8],
+        "actions": [1, 20],
+        "frame_sizes": [16, 64],
+        "frames": [8],
+        "max_render_lengths": [16384, 1024],
+    },
+    "full": {
+        "rotations": [1, 4, 8],
+        "actions": [1, 20, 200],
+        "frame_sizes": [16, 64, 256],
+        "frames": [8, 24],
+        "max_render_lengths": [16384, 4096, 1024],
+    },
+}
+
+
+def load_sheet_export():
+    # Package without its __init__.py, that one imports bpy
+    package = ModuleType(PACKAGE_NAME)
+    package.__path__ = [REPOSITORY_DIRECTORY]
+    sys.modules[PACKAGE_NAME] = package
+    return importlib.import_module(f"{PACKAGE_NAME}.sheet_export")
+
+
+# ------------------------------------------------------------------------
+#   Synthetic data
+# ------------------------------------------------------------------------
+
+def synthetic_frame(size, seed):
+    # Opaque blob in the middle of transparent frame, like a rendered character
+    rng = np.random.default_rng(seed)
+    frame = np.zeros((size, size, 4), np.uint8)
+    margin = size // 4
+    frame[margin:size - margin, margin:size - margin, :3] = rng.integers(0, 256, (size - 2 * margin, size - 2 * margin, 3), dtype=np.uint8)
+    frame[margin:size - margin, margin:size - margin, 3] = 255
+    return frame
+
+
+def synthetic_strip(size, rotations, frames, seed):
+    # Every second frame repeats the previous one, hold poses are common in real animations
+    rows = []
+    for rotation in range(rotations):
+        row = [synthetic_frame(size, seed * 1000 + rotation * 100 + frame // 2) for frame in range(frames)]
+        rows.append(np.concatenate(row, axis=1))
+    return np.concatenate(rows, axis=0)
+
+
+def synthetic_render_dict(case):
+    strips = {}
+    for action in range(case["actions"]):
+        strips[f"action_{action}"] = synthetic_strip(case["frame_size"], case["rotations"], case["frames"], action)
+    return {"sheet": strips}
+
+
+def fake_blender_data(render_dict, case):
+    # create_json_from_dict reads action length and render resolution only
+    actions = {x: SimpleNamespace(frame_end=case["frames"]) for strips in render_dict.values() for x in strips.keys()}
+    scene = SimpleNamespace(render=SimpleNamespace(resolution_x=case["frame_size"], resolution_y=case["frame_size"]))
+    return SimpleNamespace(actions=actions), scene
+
+
+def case_bytes(case):
+    return case["actions"] * case["rotations"] * case["frames"] * case["frame_size"] ** 2 * 4
+
+
+def directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, x)) for x in os.listdir(directory))
+
+
+# ------------------------------------------------------------------------
+#   Benchmarks, every one returns function to measure and function giving size of its output
+# ------------------------------------------------------------------------
+
+def bench_combine_frames(sheet_export, case, directory):
+    paths = []
+    for index in range(case["frames"]):
+        path = os.path.join(directory, f"frame_{index:04}.png")
+        cv2.imwrite(path, synthetic_frame(case["frame_size"], index))
+        paths.append(path)
+    result = {}
+
+    def run():
+        result["strip"] = sheet_export.combine_frames(paths)
+    return run, lambda: result["strip"].nbytes
+
+
+def bench_make_all_renders_same_width(sheet_export, case, directory):
+    # Strips of actions with different frame counts
+    strips = [synthetic_strip(case["frame_size"], case["rotations"], max(1, case["frames"] - x % 4), x) for x in range(case["actions"])]
+    result = {}
+
+    def run():
+        render_array = list(strips)
+        sheet_export.make_all_renders_same_width(render_array)
+        result["strips"] = render_array
+    return run, lambda: sum(x.nbytes for x in result["strips"])
+
+
+def bench_extend_image_with_blank_to_size(sheet_export, case, directory):
+    strip = synthetic_strip(case["frame_size"], case["rotations"], case["frames"], 0)
+    desired_size = (strip.shape[0], strip.shape[1] + case["frame_size"] * 4, 4)
+    result = {}
+
+    def run():
+        result["image"] = sheet_export.extend_image_with_blank_to_size(strip, desired_size)
+    return run, lambda: result["image"].nbytes
+
+
+def _bench_images(sheet_export, case, directory, dedup=False, pack=False, stream=False):
+    render_dict = synthetic_render_dict(case)
+    frame_size = (case["frame_size"], case["frame_size"])
+
+    def run():
+        layouts = sheet_export.create_layouts_from_dict(render_dict, case["max_render_length"], frame_size, dedup, pack)
+        sheet_export.create_images_from_dict(render_dict, layouts, ".png", directory, stream)
+    return run, lambda: directory_bytes(directory)
+
+
+def bench_create_images_from_dict(sheet_export, case, directory):
+    return _bench_images(sheet_export, case, directory)
+
+
+def bench_create_images_from_dict_streamed(sheet_export, case, directory):
+    return _bench_images(sheet_export, case, directory, stream=True)
+
+
+def bench_create_images_from_dict_dedup(sheet_export, case, directory):
+    return _bench_images(sheet_export, case, directory, dedup=True)
+
+
+def bench_create_images_from_dict_packed(sheet_export, case, directory):
+    return _bench_images(sheet_export, case, directory, dedup=True, pack=True)
+
+
+def bench_create_json_from_dict(sheet_export, case, directory):
+    render_dict = synthetic_render_dict(case)
+    layouts = sheet_export.create_layouts_from_dict(render_dict, case["max_render_length"])
+    bpy_data, scene = fake_blender_data(render_dict, case)
+
+    def run():
+        sheet_export.create_json_from_dict(render_dict, layouts, bpy_data, scene, case["rotations"], False, "", directory)
+    return run, lambda: directory_bytes(directory)
+
+
+# Benchmark name to (function, case parameters it depends on)
+BENCHMARKS = {
+    "combine_frames": (bench_combine_frames, ("frame_size", "frames")),
+    "make_all_renders_same_width": (bench_make_all_renders_same_width, ("rotations", "actions", "frame_size", "frames")),
+    "extend_image_with_blank_to_size": (bench_extend_image_with_blank_to_size, ("rotations", "frame_size", "frames")),
+    "create_images_from_dict": (bench_create_images_from_dict, ("rotations", "actions", "frame_size", "frames", "max_render_length")),
+    "create_images_from_dict_streamed": (bench_create_images_from_dict_streamed, ("rotations", "actions", "frame_size", "frames", "max_render_length")),
+    "create_images_from_dict_dedup": (bench_create_images_from_dict_dedup, ("rotations", "actions", "frame_size", "frames", "max_render_length")),
+    "create_images_from_dict_packed": (bench_create_images_from_dict_packed, ("rotations", "actions", "frame_size", "frames", "max_render_length")),
+    "create_json_from_dict": (bench_create_json_from_dict, ("rotations", "actions", "frames", "max_render_length")),
+}
+
+
+# ------------------------------------------------------------------------
+#   Runner
+# ------------------------------------------------------------------------
+
+def sweep_cases(sweep, parameters, max_case_bytes):
+    # Parameters the benchmark doesn't depend on are fixed to their first value, so cases aren't repeated
+    values = {
+        "rotations": sweep["rotations"],
+        "actions": sweep["actions"],
+        "frame_size": sweep["frame_sizes"],
+        "frames": sweep["frames"],
+        "max_render_length": sweep["max_render_lengths"],
+    }
+    names = list(values.keys())
+    choices = [values[x] if x in parameters else values[x][:1] for x in names]
+    for combination in itertools.product(*choices):
+        case = dict(zip(names, combination))
+        if case_bytes(case) <= max_case_bytes:
+            yield case
+
+
+def measure(run, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    # Separate traced run, tracing slows the code down and would skew times
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), statistics.median(times), peak
+
+
+def case_id(name, case):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in case.items()) + "]"
+
+
+def run_benchmarks(names, sweep, repeats, max_case_bytes):
+    sheet_export = load_sheet_export()
+    results = []
+    for name in names:
+        benchmark, parameters = BENCHMARKS[name]
+        for case in sweep_cases(sweep, parameters, max_case_bytes):
+            with tempfile.TemporaryDirectory() as directory:
+                output_directory = os.path.join(directory, "out")
+                os.makedirs(output_directory)
+                run, output_bytes = benchmark(sheet_export, case, directory if name == "combine_frames" else output_directory)
+                best, median, peak = measure(run, repeats)
+                result = {
+                    "id": case_id(name, case),
+                    "benchmark": name,
+                    "case": case,
+                    "best_s": best,
+                    "median_s": median,
+                    "peak_memory_bytes": peak,
+                    "output_bytes": output_bytes(),
+                }
+            results.append(result)
+            print(f"{result['id']:<110} {best * 1000:10.2f} ms {peak / 2**20:10.1f} MiB peak {result['output_bytes'] / 2**20:10.1f} MiB output")
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, 'r') as fp:
+        baseline = {x["id"]: x for x in json.load(fp)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["id"])
+        if previous == None or previous["best_s"] <= 0:
+            continue
+        ratio = result["best_s"] / previous["best_s"]
+        if ratio > threshold:
+            regressions.append((result["id"], ratio))
+    for case, ratio in regressions:
+        print(f"Regression: {case} is {ratio:.2f}x slower than baseline")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of post processing functions, no Blender needed")
+    parser.add_argument("--sweep", choices=SWEEPS.keys(), default="quick")
+    parser.add_argument("--benchmark", action="append", choices=BENCHMARKS.keys(), help="Run only this benchmark, can be repeated")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-case-mb", type=int, default=512, help="Cases with more frame data than this are skipped")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Results json of earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as regression")
+    args = parser.parse_args(argv)
+
+    names = args.benchmark if args.benchmark != None else list(BENCHMARKS.keys())
+    results = run_benchmarks(names, SWEEPS[args.sweep], args.repeats, args.max_case_mb * 2**20)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "sweep": args.sweep,
+        "repeats": args.repeats,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cv2": cv2.__version__,
+        "results": results,
+    }
+    with open(args.output, 'w') as fp:
+        json.dump(report, fp, indent=4)
+    print(f"Results saved to {args.output}")
+
+    if args.compare != None and len(compare(results, args.compare, args.threshold)) > 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
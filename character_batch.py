@@ -0,0 +1,73 @@
+# ------------------------------------------------------------------------
+#   Characters of animation render
+# ------------------------------------------------------------------------
+#
+# Animation render works on one CharacterSetup at a time. Without character batch it is the character
+# set up in Actions Mixer panel, with it every enabled row of scene.CharacterBatchColl. Everything else
+# (cameras, node index, render settings, temp directories) is set up once for all of them.
+# Outputs of batch characters are prefixed with character name so they don't overwrite each other.
+
+
+class CharacterSetup:
+    def __init__(self, character, actions, prop_collection, wearable_collection, file_prefix=""):
+        self.character = character
+        # Actions mixer rows rendered for this character
+        self.actions = actions
+        self.prop_collection = prop_collection
+        self.wearable_collection = wearable_collection
+        self.file_prefix = file_prefix
+
+    @property
+    def name(self):
+        return self.character.name if self.character != None else ""
+
+    def objects(self):
+        # Character with all its meshes, hidden while other batch characters render
+        if self.character == None:
+            return []
+        return [self.character] + list(self.character.children_recursive)
+
+    def collections(self):
+        return [x for x in (self.prop_collection, self.wearable_collection) if x != None]
+
+
+def scene_characters(scene, use_batch):
+    if not use_batch:
+        return [CharacterSetup(scene.CharacterPointer, list(scene.ActionsPropColl), scene.PropCollectionPointer, scene.WearableCollectionPointer)]
+    characters = []
+    for batch_row in scene.CharacterBatchColl:
+        if not batch_row.enabled or batch_row.character == None:
+            continue
+        characters.append(CharacterSetup(batch_row.character, list(batch_row.actions), batch_row.prop_collection, batch_row.wearable_collection, f"{batch_row.character.name}_"))
+    return characters
+
+
+class CharacterIsolation:
+    """
+    Shows only one character of the batch: objects and prop/wearable collections of all other characters
+    are hidden in render, the selected one gets its visibility from before the render back.
+    """
+
+    def __init__(self, characters):
+        self.characters = characters
+        self.objects = {}
+        self.collections = {}
+        for character in characters:
+            for obj in character.objects():
+                self.objects[obj] = obj.hide_render
+            for collection in character.collections():
+                self.collections[collection] = collection.hide_render
+
+    def select(self, selected):
+        for character in self.characters:
+            if character == selected:
+                continue
+            for obj in character.objects():
+                obj.hide_render = True
+            for collection in character.collections():
+                collection.hide_render = True
+        # Shared collections and objects end up visible for the selected character
+        for obj in selected.objects():
+            obj.hide_render = self.objects[obj]
+        for collection in selected.collections():
+            collection.hide_render = self.collections[collection]
@@ -1,5 +1,7 @@
 import bpy
 
+from .node_toggles import NodeToggleController, BACKGROUND_TOGGLE, COLLISION_TOGGLE, FOREGROUND_TOGGLE
+
 def _get_geometry_nodes(_1, _2):
     nodes = bpy.data.node_groups
     geometry_nodes = [(x, x, "") for x in nodes.keys() if nodes[x].type == 'GEOMETRY' and nodes[x].is_modifier == True]
@@ -70,10 +72,11 @@ class EnvironmentHelperMixerToggleBoolOperator(bpy.types.Operator):
 
     def execute(self, context):
 
-        for node in bpy.data.node_groups:
-            set_bool_in_geometry_nodes(node, "enable_in_background_render", context.scene.BackgroundIsEnabled)
-            set_bool_in_geometry_nodes(node, "enable_in_collision_render", context.scene.CollisionIsEnabled)
-            set_bool_in_geometry_nodes(node, "enable_in_foreground_render", context.scene.ForegroundIsEnabled)
+        NodeToggleController(bpy.data.node_groups).set_many({
+            BACKGROUND_TOGGLE: context.scene.BackgroundIsEnabled,
+            COLLISION_TOGGLE: context.scene.CollisionIsEnabled,
+            FOREGROUND_TOGGLE: context.scene.ForegroundIsEnabled,
+        })
         
         return {'FINISHED'}
 
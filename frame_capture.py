@@ -0,0 +1,181 @@
+import bpy
+import numpy as np
+
+from .render_border import border_region
+
+# ------------------------------------------------------------------------
+#   In-memory frame capture
+# ------------------------------------------------------------------------
+
+# Render Result pixels are not accessible from python, Viewer Node image is.
+VIEWER_IMAGE_NAME = "Viewer Node"
+# Only view transforms whose color conversion we reproduce in numpy. Render dither
+# (scene.render.dither_intensity, 1.0 by default) is not reproduced: PNG writer adds noise before
+# quantizing to 8 bits, so pixels can differ from disk capture by a level. Render cache keeps them apart.
+SUPPORTED_VIEW_TRANSFORMS = ["Standard", "Raw"]
+
+
+def linear_to_srgb(values):
+    low = values * 12.92
+    high = 1.055 * np.power(np.maximum(values, 0.0031308), 1.0 / 2.4) - 0.055
+    return np.where(values <= 0.0031308, low, high)
+
+
+def float_rgba_to_bgra(frame, view_settings):
+    # Blender keeps rows bottom to top and alpha premultiplied,
+    # PNG (and therefore cv2.imread) gives us top to bottom straight alpha in BGRA order
+    frame = frame[::-1]
+    alpha = frame[..., 3:4]
+    rgb = np.divide(frame[..., :3], alpha, out=np.zeros_like(frame[..., :3]), where=alpha > 0)
+    if view_settings.exposure != 0.0:
+        rgb = rgb * np.float32(2.0 ** view_settings.exposure)
+    if view_settings.view_transform == "Standard":
+        rgb = linear_to_srgb(np.clip(rgb, 0.0, 1.0))
+    if view_settings.gamma != 1.0:
+        rgb = np.power(np.clip(rgb, 0.0, 1.0), 1.0 / view_settings.gamma)
+
+    bgra = np.empty(frame.shape, np.uint8)
+    bgra[..., 0:3] = np.clip(rgb[..., ::-1] * 255.0 + 0.5, 0, 255)
+    bgra[..., 3] = np.clip(alpha[..., 0] * 255.0 + 0.5, 0, 255)
+    return bgra
+
+
+def is_capture_supported(scene):
+    if scene.view_settings.view_transform not in SUPPORTED_VIEW_TRANSFORMS:
+        return False
+    if scene.view_settings.look not in ("None", ""):
+        return False
+    return scene.render.use_compositing
+
+
+class FrameCapture:
+    """
+    Renders current scene frame range frame by frame and copies every frame from Viewer Node
+    straight into a preallocated horizontal strip. Nothing is written to disk, but every frame is its
+    own render call, so render start-up (scene sync, shader and BVH preparation) is paid per frame.
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.width = int(scene.render.resolution_x * scene.render.resolution_percentage / 100)
+        self.height = int(scene.render.resolution_y * scene.render.resolution_percentage / 100)
+        # Reused for every frame, foreach_get needs flat float buffer
+        self.scratch = np.empty(self.width * self.height * 4, dtype=np.float32)
+        self.strip = None
+        # Frame number to its position in the strip
+        self.frame_slots = {}
+        self.error = None
+        self.created_nodes = []
+        self.previous_use_nodes = scene.use_nodes
+        # We keep reference so we can remove exactly the same object from handlers
+        self.handler = self._on_render_post
+
+        self._setup_compositor()
+        bpy.app.handlers.render_post.append(self.handler)
+
+    def _setup_compositor(self):
+        scene = self.scene
+        scene.use_nodes = True
+        tree = scene.node_tree
+
+        render_layers = None
+        composite = None
+        for node in tree.nodes:
+            if node.type == 'R_LAYERS' and render_layers == None:
+                render_layers = node
+            if node.type == 'COMPOSITE' and composite == None:
+                composite = node
+        if render_layers == None:
+            render_layers = tree.nodes.new('CompositorNodeRLayers')
+            self.created_nodes.append(render_layers)
+        if composite == None:
+            # Without composite output compositor is not executed at all
+            composite = tree.nodes.new('CompositorNodeComposite')
+            self.created_nodes.append(composite)
+            tree.links.new(render_layers.outputs['Image'], composite.inputs['Image'])
+
+        # Capture exactly what would be written to the file
+        source = render_layers.outputs['Image']
+        if self.previous_use_nodes and composite.inputs['Image'].is_linked:
+            source = composite.inputs['Image'].links[0].from_socket
+
+        viewer = tree.nodes.new('CompositorNodeViewer')
+        viewer.use_alpha = True
+        self.created_nodes.append(viewer)
+        tree.links.new(source, viewer.inputs['Image'])
+        tree.nodes.active = viewer
+
+    def _on_render_post(self, scene, depsgraph=None):
+        # Exceptions thrown inside handlers are only printed, so we keep it for later
+        if self.strip is None or self.error != None:
+            return
+        image = bpy.data.images.get(VIEWER_IMAGE_NAME)
+        if image == None:
+            self.error = "Viewer Node image is missing"
+            return
+        if scene.frame_current not in self.frame_slots.keys():
+            return
+        width, height = image.size
+        region = (0, 0, self.width, self.height)
+        if (width, height) != (self.width, self.height):
+            # Render border cropped the result, it goes back to its place in full frame
+            region = border_region(scene, self.width, self.height)
+            if region == None or (width, height) != (region[2], region[3]):
+                self.error = f"Viewer Node image has unexpected size {width}x{height}"
+                return
+        pixels = self.scratch[:width * height * 4]
+        image.pixels.foreach_get(pixels)
+        frame = float_rgba_to_bgra(pixels.reshape(height, width, 4), scene.view_settings)
+
+        x = self.frame_slots[scene.frame_current] * self.width
+        target = self.strip[:, x:x + self.width]
+        if width != self.width or height != self.height:
+            target[...] = 0
+        target[region[1]:region[1] + height, region[0]:region[0] + width] = frame
+
+    def frame_count(self):
+        return len(range(self.scene.frame_start, self.scene.frame_end + 1, self.scene.frame_step))
+
+    def render_strip(self, out=None):
+        # Same frames as bpy.ops.render.render(animation=True) would produce.
+        # When out is given frames are written straight into it
+        scene = self.scene
+        return self.render_frames(range(scene.frame_start, scene.frame_end + 1, scene.frame_step), out)
+
+    def render_frames(self, frames, out=None):
+        scene = self.scene
+        frames = list(frames)
+        self.frame_slots = {frame: i for i, frame in enumerate(frames)}
+        if out is None:
+            out = np.zeros((self.height, len(frames) * self.width, 4), np.uint8)
+        self.strip = out
+        self.error = None
+
+        previous_frame = scene.frame_current
+        try:
+            for frame in frames:
+                scene.frame_set(frame)
+                bpy.ops.render.render(
+                    animation=False,
+                    write_still=False,
+                    use_viewport=False,
+                    layer='',
+                    scene=''
+                )
+                if self.error != None:
+                    raise RuntimeError(self.error)
+        finally:
+            scene.frame_set(previous_frame)
+
+        strip = self.strip
+        self.strip = None
+        return strip
+
+    def teardown(self):
+        if self.handler in bpy.app.handlers.render_post:
+            bpy.app.handlers.render_post.remove(self.handler)
+        tree = self.scene.node_tree
+        for node in self.created_nodes:
+            tree.nodes.remove(node)
+        self.created_nodes = []
+        self.scene.use_nodes = self.previous_use_nodes
@@ -0,0 +1,87 @@
+import hashlib
+import math
+import numpy as np
+
+from .atlas_layout import compose_band
+
+# ------------------------------------------------------------------------
+#   Deduplicated sprite sheet layout
+# ------------------------------------------------------------------------
+
+class DedupLayout:
+    """
+    Sheet layout that stores every distinct frame once. Strips are cut into frames, identical frames
+    (hold poses, idle, blank padding) share one cell. Cells are stacked in columns of at most max_length
+    pixels, json gets cell positions and per action rows of cell indices instead of strip positions.
+    Same interface as AtlasLayout.
+    """
+
+    def __init__(self, strips, max_length, frame_width, frame_height):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.depth = 4
+        self.dtype = np.uint8
+        # Where every unique frame is taken from, (action name, x, y) in its strip
+        self.sources = []
+        # Action name to rows of unique frame indices
+        self.sequences = {}
+        self.frame_count = 0
+        digests = {}
+
+        for action_name in [x for x in strips.keys() if x != 'None']:
+            strip = np.asarray(strips[action_name])
+            height, width = strip.shape[:2]
+            if height % frame_height != 0 or width % frame_width != 0:
+                raise ValueError(f"Strip of {action_name} with shape {strip.shape} is not made of {frame_width}x{frame_height} frames")
+            self.depth = strip.shape[2]
+            self.dtype = strip.dtype
+            rows = []
+            for y in range(0, height, frame_height):
+                row = []
+                for x in range(0, width, frame_width):
+                    frame = strip[y:y + frame_height, x:x + frame_width]
+                    row.append(self._frame_index(digests, strips, frame, action_name, x, y))
+                    self.frame_count += 1
+                rows.append(row)
+            self.sequences[action_name] = rows
+
+        self.frames_per_column = max(1, max_length // frame_height)
+        column_count = math.ceil(len(self.sources) / self.frames_per_column)
+        self.width = column_count * frame_width
+        self.height = min(len(self.sources), self.frames_per_column) * frame_height
+        self.positions = [self._position(x) for x in range(len(self.sources))]
+
+    def _frame_index(self, digests, strips, frame, action_name, x, y):
+        digest = hashlib.blake2b(np.ascontiguousarray(frame).tobytes(), digest_size=16).digest()
+        # Digest only narrows candidates down, frames are compared pixel by pixel
+        for index in digests.get(digest, []):
+            source_name, source_x, source_y = self.sources[index]
+            source = np.asarray(strips[source_name])[source_y:source_y + self.frame_height, source_x:source_x + self.frame_width]
+            if np.array_equal(source, frame):
+                return index
+        self.sources.append((action_name, x, y))
+        digests.setdefault(digest, []).append(len(self.sources) - 1)
+        return len(self.sources) - 1
+
+    def _position(self, index):
+        # Pixel position of unique frame top left corner in the sheet
+        return [index // self.frames_per_column * self.frame_width, index % self.frames_per_column * self.frame_height]
+
+    @property
+    def action_names(self):
+        return list(self.sequences.keys())
+
+    def sheet_json(self):
+        return {"unique_frame_count": len(self.sources), "unique_frame_positions_px": self.positions}
+
+    def action_json(self, action_name):
+        return {"frame_indices": self.sequences[action_name]}
+
+    def rects(self):
+        return [(sheet_x, sheet_y, self.frame_width, self.frame_height, action_name, x, y) for (action_name, x, y), (sheet_x, sheet_y) in zip(self.sources, self.positions)]
+
+    def compose_rows(self, strips, top, bottom):
+        return compose_band(strips, self.rects(), top, bottom, self.width, self.depth, self.dtype)
+
+    def compose(self, strips):
+        return self.compose_rows(strips, 0, self.height)
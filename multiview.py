@@ -0,0 +1,59 @@
+# ------------------------------------------------------------------------
+#   All cameras as views of one multiview render
+# ------------------------------------------------------------------------
+#
+# Blender picks camera of every view by name: scene camera name with its view suffix replaced by
+# suffix of the rendered view. Target cameras are renamed for the render to follow that scheme
+# and get their names back in teardown().
+
+MULTIVIEW_CAMERA_PREFIX = "EMET_MULTIVIEW_CAMERA"
+MULTIVIEW_VIEW_PREFIX = "EMET_VIEW_"
+
+
+class MultiviewCameras:
+    def __init__(self, scene, cameras):
+        self.scene = scene
+        self.cameras = cameras
+        render = scene.render
+        self.previous_names = [x.name for x in cameras]
+        self.previous_use_multiview = render.use_multiview
+        self.previous_views_format = render.views_format
+        self.previous_image_views_format = render.image_settings.views_format
+        self.previous_view_use = {x.name: x.use for x in render.views}
+        self.views = []
+        self.view_names = []
+
+        try:
+            for index, camera in enumerate(cameras):
+                suffix = f"_V{index}"
+                camera.name = MULTIVIEW_CAMERA_PREFIX + suffix
+                view = render.views.new(f"{MULTIVIEW_VIEW_PREFIX}{index}")
+                view.camera_suffix = suffix
+                self.views.append(view)
+                self.view_names.append(view.name)
+            for view in render.views:
+                view.use = view.name in self.view_names
+            render.use_multiview = True
+            render.views_format = 'MULTIVIEW'
+            # Every view written to its own file
+            render.image_settings.views_format = 'INDIVIDUAL'
+        except:
+            self.teardown()
+            raise
+
+    def frame_paths(self, view_index, frames):
+        return [self.scene.render.frame_path(frame=frame, view=self.view_names[view_index]) for frame in frames]
+
+    def teardown(self):
+        render = self.scene.render
+        render.use_multiview = self.previous_use_multiview
+        render.views_format = self.previous_views_format
+        render.image_settings.views_format = self.previous_image_views_format
+        for view in self.views:
+            render.views.remove(view)
+        self.views = []
+        for view in render.views:
+            if view.name in self.previous_view_use.keys():
+                view.use = self.previous_view_use[view.name]
+        for camera, name in zip(self.cameras, self.previous_names):
+            camera.name = name
@@ -0,0 +1,50 @@
+# ------------------------------------------------------------------------
+#   Geometry nodes boolean toggles
+# ------------------------------------------------------------------------
+
+# Labels of boolean nodes our geometry nodes use to switch render passes
+BACKGROUND_TOGGLE = "enable_in_background_render"
+COLLISION_TOGGLE = "enable_in_collision_render"
+FOREGROUND_TOGGLE = "enable_in_foreground_render"
+
+
+class NodeToggleController:
+    """
+    Indexes labeled boolean nodes of all node groups once, so toggling a label doesn't scan
+    every node of every group again. Only nodes whose value actually changes are written,
+    every write makes Blender re-evaluate geometry using that node group.
+    Index is valid as long as node groups are not added or removed, build it once per render.
+    """
+
+    def __init__(self, node_groups):
+        # Label to boolean nodes with that label in every group
+        self.label_nodes = {}
+        # Node group name to label to its boolean nodes
+        self.group_nodes = {}
+        self.writes = 0
+        for node_group in node_groups:
+            group_labels = {}
+            for node in node_group.nodes:
+                if node.label == "" or not hasattr(node, "boolean"):
+                    continue
+                group_labels.setdefault(node.label, []).append(node)
+                self.label_nodes.setdefault(node.label, []).append(node)
+            self.group_nodes[node_group.name_full] = group_labels
+
+    def _write(self, nodes, value):
+        for node in nodes:
+            if node.boolean != value:
+                node.boolean = value
+                self.writes += 1
+
+    def set(self, label, value):
+        # Same as set_bool_in_geometry_nodes called for every node group
+        self._write(self.label_nodes.get(label, []), value)
+
+    def set_many(self, values):
+        # Dictionary of label to value
+        for label, value in values.items():
+            self.set(label, value)
+
+    def set_in_group(self, node_group, label, value):
+        self._write(self.group_nodes.get(node_group.name_full, {}).get(label, []), value)
@@ -3,6 +3,8 @@ import math
 from copy import deepcopy
 import datetime
 import json
+import time
+import gc
 
 # ------------------------------------------------------------------------
 #   Combine output images
@@ -10,48 +12,63 @@ import json
 
 import cv2
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
 import numpy as np
 
+from .frame_capture import FrameCapture, is_capture_supported
+from .sheet_export import combine_frames, read_frame, create_layouts_from_dict, create_json_from_dict, create_images_from_dict
+from .strip_store import StripStore, StripMemoryBudget
+from .render_farm import run_farm, collect_unit_strips, save_unit_strips
+from .render_cache import RenderCache, SceneStateHasher
+from .rotation_symmetry import mirror_source_rotations, MIRROR_NONE, MIRROR_X, MIRROR_Y
+from .render_border import renderable_objects, collect_world_corners, compute_border
+from .render_checkpoint import JobCheckpoint, find_resumable_job, unit_key
+from .node_toggles import NodeToggleController, BACKGROUND_TOGGLE, COLLISION_TOGGLE, FOREGROUND_TOGGLE
+from .stage_layers import StageLayers, StageSplitUnsupported, is_stage_split_supported
+from .multiview import MultiviewCameras
+from .visibility_layers import VisibilityLayers
+from .scene_state import SceneStateRecorder
+from .character_batch import CharacterIsolation, scene_characters
+from .render_schedule import RenderUnit, UnitState, plan_units, count_transitions
+from .tile_batch import BatchFrame, is_batch_supported, tile_frame_size, tile_pixel_offsets, group_tiles, has_overlapping_tiles
+
 # Globuls
 animation_render = "0"
 tile_render = "1"
 environment_render = "2"
 
-def return_smaller_affix(x, prefix):
-    # Cutting out: prefix, .png
-    # This leaves only number to be compared
-    return int(x[len(prefix):-4])
-
-def combine_frames(inputPath, prefix):
-    # Get everything that is a file and starts with prefix from inputPath
-    filepaths = []
-    if len(os.listdir(inputPath)) == 0:
-        return []
-    files = []
-    for f in os.listdir(inputPath):
-        fp = os.path.join(inputPath, f)
-        if not os.path.isfile(fp) or not f.startswith(prefix):
-            continue
-        files.append(f)
-    files.sort(key = lambda x:  return_smaller_affix(x, prefix))
-    # Add back .png
-    # This slicing of string could have been avoided if i bothered to write better sorting of paths
-    for f in files:
-        filepaths.append(os.path.join(inputPath, str(f)))
-
-    images = [cv2.imread(filepath, cv2.IMREAD_UNCHANGED) for filepath in filepaths]
-    return cv2.hconcat(images)
-
-
-def read_image(inputPath):
-    path = Path(f"{inputPath}")
-
-    if path.is_file() == False:
-        return
-
-    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
-    return image
+memory_capture = "0"
+disk_capture = "1"
+
+# Shared between modal render operator and panel
+render_progress = {
+    "running": False,
+    "cancel_requested": False,
+    "done": 0,
+    "total": 0,
+    "start_time": 0.0,
+    # Message of the error last render stopped on, None when it finished. Read by batch_cli
+    "error": None,
+}
+
+def format_eta():
+    done = render_progress["done"]
+    total = render_progress["total"]
+    if done == 0 or total == 0:
+        return "--:--"
+    elapsed = time.time() - render_progress["start_time"]
+    remaining = int(elapsed / done * (total - done))
+    return f"{remaining // 3600:02}:{remaining // 60 % 60:02}:{remaining % 60:02}"
+
+# How many times attack animations are slowed down with TripleAttackAnimationFrames
+ATTACK_FRAME_MULTIPLIER = 3
+
+def animation_frame_paths(scene):
+    # Paths Blender writes animation frames to, same naming as bpy.ops.render.render(animation=True)
+    return [scene.render.frame_path(frame=frame) for frame in range(scene.frame_start, scene.frame_end + 1, scene.frame_step)]
+
 
 class EMET_properties(bpy.types.PropertyGroup):
 
@@ -94,6 +111,118 @@ class EMET_properties(bpy.types.PropertyGroup):
                                      default="0",
                                      items=render_types)
 
+    # In memory capture renders one frame per render call, disk capture one animation render per strip.
+    # Memory wins when PNG writing and reading costs more than render start-up of every frame.
+    # Disk stays default, its pixels are the ones renders always had
+    capture_modes = [
+                (memory_capture,"In Memory","Copy frames straight from render result, nothing is written to disk. Every frame is a separate render call and render dither is not applied, so pixels can differ slightly from disk capture"),
+                (disk_capture,"Disk","Write every frame as PNG to temp directory and read it back"),
+                ]
+
+    capture_mode: bpy.props.EnumProperty(name="", # Name is described in label above
+                                     description="How rendered animation frames are collected",
+                                     default="1",
+                                     items=capture_modes)
+
+    render_workers : bpy.props.IntProperty(
+        name = "Render Workers",
+        description="How many background Blender processes render animation in parallel. 1 renders in this Blender",
+        default = 1,
+        min = 1,
+        max = 64
+    )
+
+    mirror_axis: bpy.props.EnumProperty(name="", # Name is described in label above
+                                     description="Render only half of rotations of mirror symmetric actions and flip the other half",
+                                     default=MIRROR_NONE,
+                                     items=[
+                                         (MIRROR_NONE, "Not Symmetric", "Render every rotation"),
+                                         (MIRROR_X, "Left/Right on X", "Character faces -Y or +Y, its left and right side are mirrored across X"),
+                                         (MIRROR_Y, "Left/Right on Y", "Character faces -X or +X, its left and right side are mirrored across Y"),
+                                     ])
+
+    use_auto_border: bpy.props.BoolProperty(
+        name="Auto Render Border",
+        description="Render only the region character, props and wearables cover in each action and rotation. Needs transparent film",
+        default=False
+    )
+
+    use_render_cache: bpy.props.BoolProperty(
+        name="Use Render Cache",
+        description="Reuse strips rendered earlier with exactly the same scene state instead of rendering them again",
+        default=False
+    )
+
+    render_cache_directory: bpy.props.StringProperty(
+        name = "",# Name is described in label above
+        description="Directory of render cache. When empty cache is kept in output directory",
+        default = "",
+        maxlen=1024,
+        subtype='DIR_PATH'
+    )
+
+    render_cache_size_mb : bpy.props.IntProperty(
+        name = "Cache Size (MB)",
+        description="Least recently used strips are removed when cache grows bigger than this",
+        default = 4096,
+        min = 1,
+    )
+
+    use_camera_orbit: bpy.props.BoolProperty(
+        name="Render Rotations In One Pass",
+        description="Keyframe camera orbit so every rotation of an action comes out of a single animation render. Frames go through disk even with in memory capture. Not used with auto render border",
+        default=False
+    )
+
+    use_multiview_cameras: bpy.props.BoolProperty(
+        name="Render Cameras As Views",
+        description="Render all cameras of camera collection as views of one multiview render, scene is evaluated once for all of them. Animation render with disk frame capture only, auto render border is not used",
+        default=False
+    )
+
+    use_character_batch: bpy.props.BoolProperty(
+        name="Render Character Batch",
+        description="Animation render renders every enabled character of Actions Mixer character batch in one job, outputs are prefixed with character name",
+        default=False
+    )
+
+    use_frame_dedup: bpy.props.BoolProperty(
+        name="Deduplicate Frames",
+        description="Store every distinct frame only once in animation sheets, json lists frames of every action as indices into unique frames",
+        default=False
+    )
+
+    strip_memory_budget_mb : bpy.props.IntProperty(
+        name = "Strip Memory (MB)",
+        description="Animation strips beyond this much memory are kept in files in the temp directory and sheets are written row by row. 0 keeps everything in memory",
+        default = 0,
+        min = 0,
+    )
+
+    use_tight_packing: bpy.props.BoolProperty(
+        name="Tight Pack Sheets",
+        description="Trim every animation frame to its visible pixels and pack trimmed frames tightly, json lists rect, trim offset and untrimmed size of every frame",
+        default=False
+    )
+
+    use_view_layer_visibility: bpy.props.BoolProperty(
+        name="Switch Visibility With View Layers",
+        description="Animation render shows props and wearables and makes character holdout by switching between prebuilt view layers instead of scaling objects to zero",
+        default=True
+    )
+
+    use_single_pass_stages: bpy.props.BoolProperty(
+        name="Render Stages In One Pass",
+        description="Environment render bakes geometry of every stage into its own view layer and renders background, collision and foreground with one render call. Stages where geometry nodes output instances or non mesh geometry are rendered separately",
+        default=False
+    )
+
+    resume_render: bpy.props.BoolProperty(
+        name="Resume Interrupted Render",
+        description="Save every finished animation strip so interrupted render can be continued, and continue newest unfinished render with the same settings in output directory without rendering its finished strips again. Saved strips are deleted when render completes",
+        default=False
+    )
+
 
 def set_bool_in_objects_geometry_nodes(object, bool_name, value):
     if 'GeometryNodes' in object.modifiers.keys():
@@ -133,20 +262,6 @@ def set_holdout_to_object(object, holdout_state):
     else:
         object.is_holdout = holdout_state
 
-def make_all_renders_same_width(render_array):
-    # Shaping different sizes of strips to have same size
-    max_w = 0
-    for py_strip in render_array:
-        strip = np.asarray(deepcopy(py_strip))
-        if strip.shape[1] > max_w:
-            max_w = strip.shape[1]
-    for i, strip in enumerate(render_array):
-        strip =  np.asarray(strip)
-        h, w, d = strip.shape
-        blank = np.zeros((h, max_w, d), strip.dtype)
-        blank[0:h, 0:w] = strip
-        render_array[i] = blank
-
 def setup_animations(scene, character_pointer, prop_pointer, animation_name):
     frame_end = bpy.data.actions[animation_name].frame_end
 
@@ -162,96 +277,27 @@ def setup_animations(scene, character_pointer, prop_pointer, animation_name):
             prop_pointer.animation_data.action = bpy.data.actions[animation_name]
 
 
+def is_action_bezier(action):
+    for curve in action.fcurves:
+        for kfp in curve.keyframe_points:
+            if kfp.interpolation != 'BEZIER':
+                return False
+    return True
+
+# Handles recomputed from key positions, so they scale with retimed keys. FREE and ALIGNED handles
+# only move with their key, which changes the curve between keys
+RETIME_SAFE_HANDLES = ('AUTO', 'AUTO_CLAMPED', 'VECTOR')
+
+def has_retime_safe_handles(action):
+    for curve in action.fcurves:
+        for kfp in curve.keyframe_points:
+            if kfp.handle_left_type not in RETIME_SAFE_HANDLES or kfp.handle_right_type not in RETIME_SAFE_HANDLES:
+                return False
+    return True
+
 def reset_animations(object):
     object.animation_data.action = None
 
-def create_json_from_dict(input_dict, bpy_data, scene, rotations, has_fg_bg, affix_filename, output_path, image_length_limit):
-    for file_name in input_dict.keys():
-        output_dict = {}
-        output_dict["frame_size_px"] = [0,0]
-        output_dict["frame_size_px"][0] = scene.render.resolution_x
-        output_dict["frame_size_px"][1] = scene.render.resolution_y
-        output_dict["rotations"] = rotations
-        output_dict["has_foreground_and_background"] = has_fg_bg
-        output_dict["data"] = {}
-        current_animation_index_x = 0
-        current_animation_index_y = 0
-        for action_name in input_dict[file_name].keys():
-            if action_name == 'None':
-                continue
-            output_dict["data"][action_name] = {}
-            output_dict["data"][action_name]["animation_length"] = bpy_data.actions[action_name].frame_end
-            current_action_height = 0
-            strip =  np.asarray(input_dict[file_name][action_name])
-            current_action_height, w, d = strip.shape
-            if current_animation_index_y*current_action_height + current_action_height > image_length_limit:
-                current_animation_index_x += 1
-                current_animation_index_y = 0
-                output_dict["data"][action_name]["animation_index_x"] = current_animation_index_x
-                output_dict["data"][action_name]["animation_index_y"] = current_animation_index_y
-                current_animation_index_y += 1
-            else:
-                output_dict["data"][action_name]["animation_index_x"] = current_animation_index_x
-                output_dict["data"][action_name]["animation_index_y"] = current_animation_index_y
-                current_animation_index_y += 1
-        out_file_name = str(file_name) + affix_filename + ".json"
-        output_json = os.path.join(output_path, out_file_name)
-        with open(output_json, 'w') as fp:
-            json.dump(output_dict, fp, indent=4)
-
-def create_images_from_dict(input_dict,affix_filename, output_path, max_file_length):
-
-    for file_name in input_dict.keys():
-        final_image = []
-        max_strip_w = 0
-        max_strip_h = 0
-        for action_name in input_dict[file_name].keys():
-            if action_name == 'None':
-                continue
-            current_array = input_dict[file_name][action_name]
-            strip = np.asarray(current_array)
-            if strip.shape[1] > max_strip_w:
-                max_strip_w = strip.shape[1]
-        current_animation_index_x = 0
-        current_animation_index_y = 0
-        for action_name in input_dict[file_name].keys():
-            if action_name == 'None':
-                continue
-            current_array = input_dict[file_name][action_name]
-            strip =  np.asarray(current_array)
-            current_height, current_width, current_depth = strip.shape
-            extend_image_with_blank_to_size(current_array, [current_height, max_strip_w, current_depth])
-
-            if len(final_image) == 0:
-                final_image = deepcopy(current_array)
-            if current_animation_index_y*current_height + current_height > max_file_length:
-                # Extend image to max_strip_h
-                current_animation_index_x += 1
-                current_animation_index_y = 0
-                final_image = extend_image_with_blank_to_size(final_image, [max_strip_h, max_strip_w*current_animation_index_x + max_strip_w, current_depth])
-                # Extend image to max_strip_w*current_animation_index_x
-                # Append current_action at 0 max_strip_w*current_animation_index_x d
-                final_image[ 0:current_height , current_animation_index_x*max_strip_w: current_animation_index_x*max_strip_w + current_width] = deepcopy(current_array)
-                current_animation_index_y += 1
-            else:
-                if current_animation_index_y*current_height + current_height > max_strip_h:
-                    max_strip_h = current_animation_index_y*current_height + current_height
-                final_image = extend_image_with_blank_to_size(final_image, [max_strip_h,  current_animation_index_x*max_strip_w + max_strip_w, current_depth])
-                strip =  np.asarray(final_image)
-                final_image[current_animation_index_y * current_height: current_animation_index_y * current_height + current_height , current_animation_index_x*max_strip_w: current_animation_index_x*max_strip_w + current_width ] = deepcopy(current_array)
-                current_animation_index_y += 1
-
-        out_file_name = str(file_name) + affix_filename
-        #final_image = np.asarray(final_image)
-        cv2.imwrite(os.path.join(output_path, out_file_name), final_image)
-    
-def extend_image_with_blank_to_size(image, desired_size):
-    strip =  np.asarray(image)
-    height, width, d = strip.shape
-    blank = np.zeros((desired_size[0], desired_size[1], desired_size[2]), strip.dtype)
-    blank[0:height, 0:width] = strip
-    image = blank
-    return deepcopy(image)
 # Those two functions exist because we cant set visibility for a collection
 def set_object_scale_to_zero(object):
     object.scale[0] = 0 
@@ -266,12 +312,17 @@ def set_object_scale_to_one(object):
 class EMET_OT_render_tiles_operator(bpy.types.Operator):
     bl_idname =  "emet.render_tiles_operator"
     bl_label = "Render"
-    bl_options = {'REGISTER', 'UNDO'}
+    # No undo push, state render changes is recorded and restored by SceneStateRecorder
+    bl_options = {'REGISTER'}
 
     context = None
     scene = None
     emet_tool = None
     actions_prop_coll = None
+    # CharacterSetup of every character this job renders and the one being rendered
+    characters = []
+    character = None
+    character_isolation = None
     camera = None
     camera_location_cache = None
     camera_rotation_cache = None
@@ -283,52 +334,701 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
     output_tmp_shadow_directory = None
     output_tmp_foreground_directory = None
     output_tmp_filename = None
+    frame_capture = None
+    farm_unit = None
+    render_cache = None
+    scene_state_hasher = None
+    border_settings_cache = None
+    action_world_corners = {}
+    target_cameras = []
+    post_executor = None
+    post_futures = []
+    unit_counter = 0
+    progress_done = 0
+    progress_total = 0
+    checkpoint = None
+    camera_index = 0
+    camera_orbit_radii = []
+    # Scene state of the last rendered unit
+    unit_state = None
+    camera_previous_action = None
+    scene_state = None
+    multiview = None
+    visibility_layers = None
+    # Camera index to strips its view rendered in earlier multiview renders, taken instead of rendering again
+    prerendered_views = {}
+    node_toggles = None
+    # Shared by strip stores when strip memory is limited
+    strip_budget = None
+    TMP_DIRECTORY_PREFIX = "tmp-render-"
     TILE_PREFIX = "tmp_tile"
     STRIP_PREFIX = "tmp_hstrip"
     render_out = []
 
+    # Set only by render farm worker, json describing unit this process should render
+    farm_unit_json: bpy.props.StringProperty(default="", options={'HIDDEN', 'SKIP_SAVE'})
 
     def execute(self, context):
+        render_progress["error"] = None
+        try:
+            self._prepare(context)
+            for _ in self._render_job_steps():
+                pass
+        except Exception as e:
+            render_progress["error"] = str(e)
+            self.report({"ERROR"}, str(e))
+            # At this point Blender data is surely modified so return FINISHED
+            return {"FINISHED"}
+        finally:
+            self._finish()
+
+        return {'FINISHED'}
+
+    def _prepare(self, context):
         # Extract data from context
+        self.camera = None
         self.context = context
         self.scene = context.scene
         self.emet_tool = self.scene.EmetTool
-        self.actions_prop_coll = self.scene.ActionsPropColl
+        # Character batch is used only by animation render, other renders take Actions Mixer character
+        use_character_batch = self.emet_tool.use_character_batch and self.emet_tool.selected_render == animation_render
+        self.characters = scene_characters(self.scene, use_character_batch)
+        self.character_isolation = None
+        if use_character_batch:
+            if len(self.characters) == 0:
+                error_msg = "Character batch has no enabled character"
+                self.report({"ERROR"}, error_msg)
+                raise ValueError(error_msg)
+            # Farm worker renders one of the characters, others still have to be hidden
+            self.character_isolation = CharacterIsolation(self.characters)
+        self.farm_unit = None
+        if self.farm_unit_json != "":
+            self.farm_unit = json.loads(self.farm_unit_json)
+            if "character_index" in self.farm_unit.keys():
+                self.characters = [self.characters[self.farm_unit["character_index"]]]
+            for character in self.characters:
+                character.actions = [x for i, x in enumerate(character.actions) if i in self.farm_unit["action_rows"]]
+        self.character = self.characters[0]
+        self.actions_prop_coll = self.character.actions
+        camera_dict = {}
         if self.scene.CameraCollectionPointer != None:
             camera_dict = self.scene.CameraCollectionPointer.objects
-        try:
-            self._setup_filepaths()
+        self.target_cameras = []
+        if len(camera_dict.keys()) == 0:
+            cameras = [ob for ob in self.scene.objects if ob.type == 'CAMERA']
+            if 1 != len(cameras):
+                error_msg = "There should only be one camera in the scene. If you want use more cameras setup camera collection"
+                self.report({"ERROR"}, error_msg)
+                raise ValueError(error_msg)
+            self.target_cameras.append(cameras[0])
+        else:
+            for camera_key in camera_dict.keys():
+                if camera_dict[camera_key].type ==  'CAMERA':
+                    self.target_cameras.append(camera_dict[camera_key])
+        self.camera = self.target_cameras[0]
+        self.scene_state = SceneStateRecorder(self.scene, self.target_cameras)
+        # Resumed job is found by settings signature, which needs cameras
+        self._setup_filepaths()
+        self._setup_checkpoint()
+        self.node_toggles = NodeToggleController(bpy.data.node_groups)
+        self._cache_camera_pos()
+        self._setup_multiview()
+        self._setup_frame_capture()
+        self._setup_render_cache()
+        self._cache_border_settings()
+        self._setup_post_processing()
+        self._setup_strip_budget()
+        self.progress_done = 0
+        self.progress_total = self._count_render_units()
+
+    def _render_job_steps(self):
+        # Generator, yields after every finished render unit so modal operator can report progress in between
+        target_cameras = self.target_cameras
+        if self.farm_unit == None and self.emet_tool.selected_render == animation_render and self.emet_tool.render_workers > 1:
+            self._render_animation_farm(target_cameras)
+            self.progress_done = self.progress_total
             target_cameras = []
-            if len(camera_dict.keys()) == 0:
-                cameras = [ob for ob in self.scene.objects if ob.type == 'CAMERA']
-                if 1 != len(cameras):
-                    error_msg = "There should only be one camera in the scene. If you want use more cameras setup camera collection"
-                    self.report({"ERROR"}, error_msg)
-                    raise ValueError(error_msg)
-                target_cameras.append(cameras[0])
+        for idx,camera in enumerate(target_cameras):
+            if self.farm_unit != None and idx != self.farm_unit["camera_index"]:
+                continue
+            self.camera = camera
+            self.camera_index = idx
+            self.scene.camera = camera
+            if self.multiview != None:
+                # Strips of this camera may still be decoding from previous camera renders
+                self._wait_for_post_processing()
+            if self.emet_tool.selected_render == animation_render:
+                # Cameras are set up once, every character renders from the same positions
+                self._setup_orbit_cameras()
+                for character in self.characters:
+                    self._select_character(character)
+                    yield from self._render_animation_steps(idx)
+            elif self.emet_tool.selected_render == tile_render:
+                self._render_tile(idx)
+                self.progress_done += 1
+                yield
+            elif self.emet_tool.selected_render == environment_render:
+                self._render_environment(idx)
+                self.progress_done += 1
+                yield
+        self._wait_for_post_processing()
+
+        if self.checkpoint != None:
+            self.checkpoint.mark_complete()
+        if self.farm_unit != None:
+            # Tells coordinator this unit finished without errors
+            Path(os.path.join(self.output_directory, "done")).touch()
+
+    def _finish(self):
+        # Runs after success, error and cancel
+        self._teardown_post_processing()
+        self._teardown_strip_budget()
+        self._teardown_multiview()
+        self._teardown_visibility_layers()
+        self._teardown_frame_capture()
+        self._restore_border_settings()
+        if self.scene_state != None:
+            self.scene_state.restore()
+            self.scene_state = None
+        self._remove_temporary_actions()
+
+    def _count_render_units(self):
+        # Same units _render_animation_steps yields after, used for progress and ETA
+        if self.farm_unit == None and self.emet_tool.selected_render == animation_render and self.emet_tool.render_workers > 1:
+            return 1
+        camera_count = len(self.target_cameras) if self.farm_unit == None else 1
+        if self.emet_tool.selected_render != animation_render:
+            return camera_count
+        pass_count = 2 if self.emet_tool.enable_bg_fg_render else 1
+        units = 0
+        for character in self.characters:
+            wearable_count = 0
+            if character.wearable_collection is not None:
+                wearable_count = len(character.wearable_collection.objects)
+            for actions_mixer_row in character.actions:
+                rendered_rotations = self._mirror_sources(actions_mixer_row).count(None)
+                units += rendered_rotations * (pass_count + wearable_count)
+                if actions_mixer_row.prop_for_action_name != 'None':
+                    units += rendered_rotations * (2 if actions_mixer_row.is_attack_render else 1)
+        return units * camera_count
+
+    def _job_signature(self):
+        # Everything that changes which rows are rendered and how, job is resumed only when it matches
+        characters = []
+        for character in self.characters:
+            wearables = []
+            if character.wearable_collection != None:
+                wearables = list(character.wearable_collection.objects.keys())
+            characters.append({
+                "name": character.name,
+                "file_prefix": character.file_prefix,
+                "wearables": wearables,
+                "actions": [[x.character_action_name, x.prop_for_action_name, x.is_attack_render, x.is_mirror_symmetric] for x in character.actions],
+            })
+        return {
+            "output_filename": self.emet_tool.output_filename,
+            "rotations": self.emet_tool.rotations,
+            "enable_bg_fg_render": self.emet_tool.enable_bg_fg_render,
+            "mirror_axis": self.emet_tool.mirror_axis,
+            "triple_attack_frames": self.scene.TripleAttackAnimationFrames,
+            "resolution": [self.scene.render.resolution_x, self.scene.render.resolution_y, self.scene.render.resolution_percentage],
+            "cameras": [x.name for x in self.target_cameras],
+            "characters": characters,
+        }
+
+    def _setup_checkpoint(self):
+        # Only single process animation render with resume enabled keeps checkpoints, farm workers start from scratch
+        self.checkpoint = None
+        if not self.emet_tool.resume_render or self.farm_unit != None or self.emet_tool.selected_render != animation_render or self.emet_tool.render_workers > 1:
+            return
+        self.checkpoint = JobCheckpoint(self.output_tmp_directory, self._job_signature())
+
+    def _setup_post_processing(self):
+        # Decoding of rendered frames and sheet encoding run on this thread while next unit renders.
+        # Single worker keeps strip store writes in order
+        self.post_executor = ThreadPoolExecutor(max_workers=1)
+        self.post_futures = []
+        self.unit_counter = 0
+
+    def _submit_post_processing(self, function, *args):
+        self.post_futures.append(self.post_executor.submit(function, *args))
+
+    def _wait_for_post_processing(self):
+        # Raises exceptions from worker thread here
+        futures = self.post_futures
+        self.post_futures = []
+        for future in futures:
+            future.result()
+
+    def _teardown_post_processing(self):
+        if self.post_executor != None:
+            self.post_executor.shutdown(wait=True, cancel_futures=True)
+            self.post_executor = None
+
+    def _setup_strip_budget(self):
+        self.strip_budget = None
+        if self.emet_tool.strip_memory_budget_mb > 0:
+            self.strip_budget = StripMemoryBudget(self.emet_tool.strip_memory_budget_mb * 1024 * 1024, self.output_tmp_strips_directory)
+
+    def _teardown_strip_budget(self):
+        if self.strip_budget != None:
+            # Post processing is done, spilled strips are not referenced anymore
+            gc.collect()
+            self.strip_budget.release()
+            self.strip_budget = None
+
+    def _remove_temporary_actions(self):
+        for key in bpy.data.actions.keys():
+            if "PREFIX_FOR_DELETION" in key:
+                bpy.data.actions.remove(bpy.data.actions[key])
+
+    def _setup_multiview(self):
+        self.multiview = None
+        self.prerendered_views = {}
+        if not self.emet_tool.use_multiview_cameras or self.emet_tool.selected_render != animation_render:
+            return
+        if self.farm_unit != None or self.emet_tool.render_workers > 1 or len(self.target_cameras) < 2:
+            return
+        self.multiview = MultiviewCameras(self.scene, self.target_cameras)
+        self.prerendered_views = {x: {} for x in range(len(self.target_cameras))}
+
+    def _teardown_multiview(self):
+        if self.multiview != None:
+            self.multiview.teardown()
+            self.multiview = None
+        self.prerendered_views = {}
+
+    def _orbit_cameras(self):
+        # Multiview render needs every camera on its orbit position, not only the current one
+        if self.multiview != None:
+            return self.target_cameras
+        return [self.camera]
+
+    def _setup_frame_capture(self):
+        self.frame_capture = None
+        if self.emet_tool.selected_render != animation_render or self.emet_tool.capture_mode != memory_capture:
+            return
+        if self.multiview != None:
+            self.report({"WARNING"}, "In memory capture can't read multiview renders, falling back to disk")
+            return
+        if not is_capture_supported(self.scene):
+            self.report({"WARNING"}, "In memory capture needs Standard or Raw view transform without look and enabled compositing, falling back to disk")
+            return
+        self.frame_capture = FrameCapture(self.scene)
+
+    def _teardown_frame_capture(self):
+        if self.frame_capture != None:
+            self.frame_capture.teardown()
+            self.frame_capture = None
+
+    def _setup_render_cache(self):
+        self.render_cache = None
+        self.scene_state_hasher = None
+        if self.emet_tool.selected_render != animation_render or not self.emet_tool.use_render_cache:
+            return
+        cache_directory = self.emet_tool.render_cache_directory
+        if cache_directory == "":
+            # Not self.output_directory, render farm workers have their own one
+            cache_directory = os.path.join(self.emet_tool.output_directory, ".render-cache")
+        self.render_cache = RenderCache(os.path.abspath(cache_directory), self.emet_tool.render_cache_size_mb * 1024 * 1024)
+        self.scene_state_hasher = SceneStateHasher()
+
+    def _cache_border_settings(self):
+        render = self.scene.render
+        self.border_settings_cache = (render.use_border, render.use_crop_to_border, render.border_min_x, render.border_max_x, render.border_min_y, render.border_max_y)
+        self.action_world_corners = {}
+        if self.emet_tool.use_auto_border and not render.film_transparent:
+            self.report({"WARNING"}, "Auto render border needs transparent film, rendering whole frames")
+
+    def _restore_border_settings(self):
+        if self.border_settings_cache == None:
+            return
+        render = self.scene.render
+        render.use_border, render.use_crop_to_border, render.border_min_x, render.border_max_x, render.border_min_y, render.border_max_y = self.border_settings_cache
+
+    def _is_auto_border_enabled(self):
+        # Multiview render shares one border between all cameras, it would clip views of other cameras
+        return self.emet_tool.use_auto_border and self.scene.render.film_transparent and self.multiview == None
+
+    def _action_world_corners(self, actions_mixer_row, render_object):
+        # Pre-pass over action frames, bounding boxes of everything that can be rendered in this action.
+        # Same for every render type, so it is computed once per action
+        action_name = actions_mixer_row.character_action_name
+        corners_key = (render_object.name, action_name)
+        if corners_key in self.action_world_corners.keys():
+            return self.action_world_corners[corners_key]
+
+        objects = [render_object]
+        if actions_mixer_row.prop_for_action_name != 'None':
+            objects.append(bpy.data.objects[actions_mixer_row.prop_for_action_name])
+        if self.character.wearable_collection is not None:
+            objects.extend(self.character.wearable_collection.objects)
+
+        # Props and wearables are scaled to zero and have no action at this point
+        saved_state = []
+        for obj in objects[1:]:
+            previous_action = obj.animation_data.action if obj.animation_data != None else None
+            saved_state.append((obj, tuple(obj.scale), previous_action))
+            set_object_scale_to_one(obj)
+            if obj.animation_data != None:
+                obj.animation_data.action = bpy.data.actions[action_name]
+        previous_frame = self.scene.frame_current
+        try:
+            meshes = []
+            for obj in objects:
+                meshes.extend(renderable_objects(obj))
+            frames = range(self.scene.frame_start, self.scene.frame_end + 1)
+            world_corners = collect_world_corners(self.scene, meshes, frames)
+        finally:
+            for obj, scale, previous_action in saved_state:
+                obj.scale = scale
+                if obj.animation_data != None:
+                    obj.animation_data.action = previous_action
+            self.scene.frame_set(previous_frame)
+
+        self.action_world_corners[corners_key] = world_corners
+        return world_corners
+
+    def _apply_render_border(self, world_corners):
+        render = self.scene.render
+        border = compute_border(self.scene, self.camera, world_corners)
+        if border == None:
+            render.use_border = False
+            return
+        render.use_border = True
+        # Frames stay full size, everything outside border is transparent
+        render.use_crop_to_border = False
+        render.border_min_x, render.border_max_x, render.border_min_y, render.border_max_y = border
+
+    def _place_camera(self, rotation):
+        # Camera orbits around Z axis, position is computed from the angle so repeated rotations don't drift
+        angle = math.pi * 2.0 / self.emet_tool.rotations * (rotation + 1)
+        for camera, radius in zip(self._orbit_cameras(), self.camera_orbit_radii):
+            camera.location.x = radius * math.cos(angle)
+            camera.location.y = radius * math.sin(angle)
+            camera.rotation_euler[2] = math.pi / 2 + angle
+
+    def _render_rotations(self, strip_store, file_name, action_name, pass_index, rotations, world_corners, base_row_for=None):
+        # Renders strips of given rotations into rows pass_index * rotations + rotation, yields after every render
+        if self.multiview != None:
+            # Reused prop frames come from current camera only, other views need all frames rendered
+            base_row_for = None
+        if self._use_camera_orbit(world_corners, base_row_for):
+            yield from self._render_orbit(strip_store, file_name, action_name, pass_index, rotations)
+            return
+        for rotation in rotations:
+            self._place_camera(rotation)
+            if world_corners is not None:
+                self._apply_render_border(world_corners)
+            base_row, base_multiplier = None, 1
+            if base_row_for != None:
+                base_row, base_multiplier = base_row_for(rotation)
+            self._render_hstrip(strip_store, file_name, action_name, pass_index * self.emet_tool.rotations + rotation, base_row, base_multiplier)
+            yield
+
+    def _capture_mode_key(self, use_frame_capture=True):
+        # Capture mode strips are really made with, memory and disk captures don't give identical pixels
+        return memory_capture if use_frame_capture and self.frame_capture != None else disk_capture
+
+    def _unit_file_name(self, file_name):
+        # Character strip names of every camera but the first have camera suffix,
+        # strips are matched between cameras by the name without it
+        camera_file_name, unit_file_name = self.unit_file_names
+        if file_name == camera_file_name or file_name.startswith(camera_file_name + "_"):
+            return unit_file_name + file_name[len(camera_file_name):]
+        return file_name
+
+    def _lookup_finished_hstrip(self, strip_store, file_name, action_name, row_index, use_frame_capture=True):
+        # Takes strip from earlier multiview render, interrupted job or render cache, returns (found, cache_key, checkpoint_key)
+        if self.multiview != None:
+            prerendered = self.prerendered_views[self.camera_index].pop(unit_key(strip_store.name, self._unit_file_name(file_name), action_name, row_index), None)
+            if prerendered is not None:
+                strip_store.write(file_name, action_name, row_index, prerendered)
+                return True, None, None
+
+        checkpoint_key = None
+        if self.checkpoint != None:
+            checkpoint_key = unit_key(self.camera_index, strip_store.name, self._unit_file_name(file_name), action_name, row_index)
+            if self.checkpoint.has(checkpoint_key):
+                finished_strip = self.checkpoint.load(checkpoint_key)
+                if finished_strip is not None:
+                    strip_store.write(file_name, action_name, row_index, finished_strip)
+                    return True, None, checkpoint_key
+
+        cache_key = None
+        if self.render_cache != None:
+            cache_key = self.scene_state_hasher.key(self.scene, self.camera, [self._capture_mode_key(use_frame_capture)])
+            cached_strip = self.render_cache.get(cache_key)
+            if cached_strip is not None:
+                strip_store.write(file_name, action_name, row_index, cached_strip)
+                self._store_finished_hstrip(cached_strip, None, checkpoint_key)
+                return True, cache_key, checkpoint_key
+        return False, cache_key, checkpoint_key
+
+    def _render_hstrip(self, strip_store, file_name, action_name, row_index, base_row=None, base_multiplier=1):
+        # Renders current frame range as one horizontal strip, straight into its row of the strip store.
+        # When base_row is given, every base_multiplier-th frame is taken from it instead of rendered
+        found, cache_key, checkpoint_key = self._lookup_finished_hstrip(strip_store, file_name, action_name, row_index)
+        if found:
+            self.progress_done += 1
+            return
+
+        if base_row is not None:
+            hstrip = self._render_with_base_row(strip_store, file_name, action_name, row_index, base_row, base_multiplier)
+        elif self.frame_capture != None:
+            row_width = self.frame_capture.frame_count() * self.frame_capture.width
+            hstrip = strip_store.row(file_name, action_name, row_index, self.frame_capture.height, row_width)
+            self.frame_capture.render_strip(hstrip)
+        elif self.multiview != None:
+            self._render_multiview_hstrip(strip_store, file_name, action_name, row_index, cache_key, checkpoint_key)
+            self.progress_done += 1
+            return
+        else:
+            # Every unit gets its own files, previous unit may still be decoding
+            self.unit_counter += 1
+            self.scene.render.filepath = os.path.join(self.output_tmp_tiles_directory, f"{self.TILE_PREFIX}{self.unit_counter}_")
+            bpy.ops.render.render(
+                animation=True,
+                write_still=True,
+                use_viewport=False,
+                layer='',
+                scene=''
+            )
+            self._submit_post_processing(self._decode_hstrip, animation_frame_paths(self.scene), strip_store, file_name, action_name, row_index, cache_key, checkpoint_key)
+            self.progress_done += 1
+            return
+
+        self._store_finished_hstrip(hstrip, cache_key, checkpoint_key)
+        self.progress_done += 1
+
+    def _render_multiview_hstrip(self, strip_store, file_name, action_name, row_index, cache_key, checkpoint_key):
+        # Renders strip for every camera at once, strips of cameras not rendered yet wait in prerendered_views
+        views = []
+        for view_index, camera in enumerate(self.target_cameras):
+            if view_index == self.camera_index:
+                views.append((view_index, cache_key, checkpoint_key))
+            elif view_index > self.camera_index:
+                view_cache_key = None
+                if self.render_cache != None:
+                    view_cache_key = self.scene_state_hasher.key(self.scene, camera, [self._capture_mode_key()])
+                view_checkpoint_key = None
+                if self.checkpoint != None:
+                    view_checkpoint_key = unit_key(view_index, strip_store.name, self._unit_file_name(file_name), action_name, row_index)
+                views.append((view_index, view_cache_key, view_checkpoint_key))
+
+        self.unit_counter += 1
+        self.scene.render.filepath = os.path.join(self.output_tmp_tiles_directory, f"{self.TILE_PREFIX}{self.unit_counter}_")
+        bpy.ops.render.render(
+            animation=True,
+            write_still=True,
+            use_viewport=False,
+            layer='',
+            scene=''
+        )
+        frames = range(self.scene.frame_start, self.scene.frame_end + 1, self.scene.frame_step)
+        for view_index, view_cache_key, view_checkpoint_key in views:
+            filepaths = self.multiview.frame_paths(view_index, frames)
+            if view_index == self.camera_index:
+                self._submit_post_processing(self._decode_hstrip, filepaths, strip_store, file_name, action_name, row_index, view_cache_key, view_checkpoint_key)
             else:
-                for camera_key in camera_dict.keys():
-                    if camera_dict[camera_key].type ==  'CAMERA':
-                        target_cameras.append(camera_dict[camera_key])
-            self.camera = target_cameras[0]
-            self._cache_camera_pos()
-            for idx,camera in enumerate(target_cameras):
-                self.camera = camera
-                if self.emet_tool.selected_render == animation_render:
-                    self._render_animation(idx)
-                elif self.emet_tool.selected_render == tile_render:
-                    self._render_tile(idx)
-                elif self.emet_tool.selected_render == environment_render:
-                    self._render_environment(idx)
-            
-            self.camera.location = self.camera_location_cache
-            self.camera.rotation_euler = self.camera_rotation_cache
-        except Exception as e:
-            self.report({"ERROR"}, str(e))
-            # At this point Blender data is surely modified so return FINISHED
-            return {"FINISHED"}
+                self._submit_post_processing(self._decode_prerendered_view, filepaths, view_index, unit_key(strip_store.name, self._unit_file_name(file_name), action_name, row_index), view_cache_key, view_checkpoint_key)
+        # Views of cameras that already finished
+        for view_index in range(self.camera_index):
+            for filepath in self.multiview.frame_paths(view_index, frames):
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+
+    def _decode_prerendered_view(self, filepaths, view_index, view_key, cache_key, checkpoint_key):
+        # Runs on post processing thread, touches no Blender data
+        hstrip = combine_frames(filepaths)
+        for filepath in filepaths:
+            os.remove(filepath)
+        self.prerendered_views[view_index][view_key] = hstrip
+        self._store_finished_hstrip(hstrip, cache_key, checkpoint_key)
 
-        return {'FINISHED'}
+    def _decode_hstrip(self, filepaths, strip_store, file_name, action_name, row_index, cache_key, checkpoint_key):
+        # Runs on post processing thread, touches no Blender data
+        hstrip = combine_frames(filepaths)
+        for filepath in filepaths:
+            os.remove(filepath)
+        strip_store.write(file_name, action_name, row_index, hstrip)
+        self._store_finished_hstrip(hstrip, cache_key, checkpoint_key)
+
+    def _use_camera_orbit(self, world_corners, base_row_for):
+        # Orbit needs the same border for all rotations and whole frame range rendered
+        if not self.emet_tool.use_camera_orbit or world_corners is not None or base_row_for != None or self.multiview != None:
+            return False
+        return self.scene.frame_start == 1 and self.scene.frame_step == 1
+
+    def _render_orbit(self, strip_store, file_name, action_name, pass_index, rotations):
+        # All rotations in one animation render, rotation i takes frames i * frame_count + 1 to (i + 1) * frame_count.
+        # Frames always go through disk, in memory capture would need one render call per frame again
+        pending = []
+        for rotation in rotations:
+            row_index = pass_index * self.emet_tool.rotations + rotation
+            self._place_camera(rotation)
+            found, cache_key, checkpoint_key = self._lookup_finished_hstrip(strip_store, file_name, action_name, row_index, use_frame_capture=False)
+            if found:
+                self.progress_done += 1
+                continue
+            pending.append((rotation, row_index, cache_key, checkpoint_key))
+        if len(pending) == 0:
+            return
+
+        frame_count = self.scene.frame_end
+        animated_objects = self._setup_orbit_timeline([x[0] for x in pending], frame_count)
+        try:
+            self.unit_counter += 1
+            self.scene.render.filepath = os.path.join(self.output_tmp_tiles_directory, f"{self.TILE_PREFIX}{self.unit_counter}_")
+            bpy.ops.render.render(
+                animation=True,
+                write_still=True,
+                use_viewport=False,
+                layer='',
+                scene=''
+            )
+            self._submit_post_processing(self._decode_orbit, animation_frame_paths(self.scene), strip_store, file_name, action_name, pending)
+        finally:
+            self._teardown_orbit_timeline(animated_objects, frame_count)
+        self.progress_done += len(pending)
+        yield
+
+    def _setup_orbit_timeline(self, rotations, frame_count):
+        # Camera jumps to next rotation every frame_count frames, every animation repeats with the same period
+        camera_data = self.camera.animation_data_create()
+        self.camera_previous_action = camera_data.action
+        camera_data.action = None
+        for i, rotation in enumerate(rotations):
+            self._place_camera(rotation)
+            self.camera.keyframe_insert(data_path="location", frame=i * frame_count + 1)
+            self.camera.keyframe_insert(data_path="rotation_euler", index=2, frame=i * frame_count + 1)
+        camera_data.action.name = "PREFIX_FOR_DELETION" + "CameraOrbit"
+        for fcurve in camera_data.action.fcurves:
+            for keyframe in fcurve.keyframe_points:
+                keyframe.interpolation = 'CONSTANT'
+
+        animated_objects = []
+        for obj in self.scene.objects:
+            if obj == self.camera or obj.animation_data == None or obj.animation_data.action == None:
+                continue
+            animation_data = obj.animation_data
+            track = animation_data.nla_tracks.new()
+            track.name = "PREFIX_FOR_DELETION"
+            strip = track.strips.new(animation_data.action.name, 1, animation_data.action)
+            if hasattr(strip, "action_slot"):
+                strip.action_slot = animation_data.action_slot
+            # Repeat of range [1, frame_count + 1) evaluates frames 1 to frame_count every period
+            strip.action_frame_start = 1
+            strip.action_frame_end = frame_count + 1
+            strip.repeat = len(rotations)
+            animated_objects.append((obj, animation_data.action, track))
+            animation_data.action = None
+        self.scene.frame_end = frame_count * len(rotations)
+        return animated_objects
+
+    def _teardown_orbit_timeline(self, animated_objects, frame_count):
+        self.scene.frame_end = frame_count
+        for obj, action, track in animated_objects:
+            obj.animation_data.nla_tracks.remove(track)
+            obj.animation_data.action = action
+        orbit_action = self.camera.animation_data.action
+        self.camera.animation_data.action = self.camera_previous_action
+        if orbit_action != None:
+            bpy.data.actions.remove(orbit_action)
+
+    def _decode_orbit(self, filepaths, strip_store, file_name, action_name, pending):
+        # Runs on post processing thread, touches no Blender data
+        orbit_strip = combine_frames(filepaths)
+        for filepath in filepaths:
+            os.remove(filepath)
+        self._split_orbit_strip(orbit_strip, strip_store, file_name, action_name, pending)
+
+    def _split_orbit_strip(self, orbit_strip, strip_store, file_name, action_name, pending):
+        row_width = orbit_strip.shape[1] // len(pending)
+        for i, (rotation, row_index, cache_key, checkpoint_key) in enumerate(pending):
+            hstrip = orbit_strip[:, i * row_width:(i + 1) * row_width]
+            strip_store.write(file_name, action_name, row_index, hstrip)
+            self._store_finished_hstrip(hstrip, cache_key, checkpoint_key)
+
+    def _store_finished_hstrip(self, hstrip, cache_key, checkpoint_key):
+        if cache_key != None:
+            self.render_cache.put(cache_key, hstrip)
+        if checkpoint_key != None:
+            self.checkpoint.save(checkpoint_key, hstrip)
+
+    def _render_frames(self, frames):
+        # Renders only given frames of current frame range into a strip, in the given order
+        if self.frame_capture != None:
+            return self.frame_capture.render_frames(frames)
+
+        frame_start, frame_end, frame_step = self.scene.frame_start, self.scene.frame_end, self.scene.frame_step
+        self.unit_counter += 1
+        self.scene.render.filepath = os.path.join(self.output_tmp_tiles_directory, f"{self.TILE_PREFIX}{self.unit_counter}_")
+        # Frames with same remainder are one animation render with step
+        step = ATTACK_FRAME_MULTIPLIER
+        try:
+            for remainder in range(step):
+                group = [x for x in frames if x % step == remainder]
+                if len(group) == 0:
+                    continue
+                self.scene.frame_start = group[0]
+                self.scene.frame_end = group[-1]
+                self.scene.frame_step = step
+                bpy.ops.render.render(
+                    animation=True,
+                    write_still=True,
+                    use_viewport=False,
+                    layer='',
+                    scene=''
+                )
+        finally:
+            self.scene.frame_start, self.scene.frame_end, self.scene.frame_step = frame_start, frame_end, frame_step
+        filepaths = [self.scene.render.frame_path(frame=x) for x in frames]
+        hstrip = combine_frames(filepaths)
+        for filepath in filepaths:
+            os.remove(filepath)
+        return hstrip
+
+    def _render_with_base_row(self, strip_store, file_name, action_name, row_index, base_row, base_multiplier):
+        # Frame multiplier*k of stretched animation is frame k of base animation, only frames in between are rendered
+        frames = list(range(self.scene.frame_start, self.scene.frame_end + 1))
+        height = base_row.shape[0]
+        depth = base_row.shape[2]
+        frame_width = int(self.scene.render.resolution_x * self.scene.render.resolution_percentage / 100)
+        hstrip = strip_store.row(file_name, action_name, row_index, height, len(frames) * frame_width, depth, base_row.dtype)
+
+        inbetween_frames = [x for x in frames if x % base_multiplier != 0]
+        if len(inbetween_frames) > 0:
+            inbetween = self._render_frames(inbetween_frames)
+        for i, frame in enumerate(frames):
+            if frame % base_multiplier == 0:
+                source_index = frame // base_multiplier - 1
+                hstrip[:, i * frame_width:(i + 1) * frame_width] = base_row[:, source_index * frame_width:(source_index + 1) * frame_width]
+            else:
+                source_index = inbetween_frames.index(frame)
+                hstrip[:, i * frame_width:(i + 1) * frame_width] = inbetween[:, source_index * frame_width:(source_index + 1) * frame_width]
+        return hstrip
+
+    def _physics_base_row(self, render_prop_anim, prop_name, action_name, rotation):
+        # Physics animation is copy of the action, stretched when TripleAttackAnimationFrames is on.
+        # Its frames at multiples of the stretch are exactly the prop frames we already rendered,
+        # as long as stretching didn't change interpolation (it forces BEZIER) or shape of handles
+        multiplier = 1
+        if self.scene.TripleAttackAnimationFrames == True:
+            multiplier = ATTACK_FRAME_MULTIPLIER
+            action = bpy.data.actions[action_name]
+            if not is_action_bezier(action) or not has_retime_safe_handles(action):
+                return None, multiplier
+        # Prop row may still be decoding
+        self._wait_for_post_processing()
+        if not render_prop_anim.has_row(prop_name, action_name):
+            return None, multiplier
+        base_row = render_prop_anim.get_row(prop_name, action_name, rotation)
+        frame_width = int(self.scene.render.resolution_x * self.scene.render.resolution_percentage / 100)
+        base_frame_count = base_row.shape[1] // frame_width
+        if self.scene.frame_start != 1 or self.scene.frame_step != 1 or self.scene.frame_end // multiplier != base_frame_count:
+            return None, multiplier
+        return base_row, multiplier
 
     def _render_environment(self, iteration):
 
@@ -336,43 +1036,45 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
         if iteration > 0:
             output_filename = f"{output_filename}_{iteration+1}"
         render_stages = ["Background", "Collision", "Foreground"]
-        bool_map_for_stages = {render_stages[0] : "enable_in_background_render",
-                               render_stages[1] : "enable_in_collision_render",
-                               render_stages[2] : "enable_in_foreground_render",
+        bool_map_for_stages = {render_stages[0] : BACKGROUND_TOGGLE,
+                               render_stages[1] : COLLISION_TOGGLE,
+                               render_stages[2] : FOREGROUND_TOGGLE,
                                 }
+        all_disabled = {x: False for x in bool_map_for_stages.values()}
         # Reset all nodes
-        for node in bpy.data.node_groups:
-                set_bool_in_geometry_nodes(node, "enable_in_background_render",False)
-                set_bool_in_geometry_nodes(node, "enable_in_collision_render" ,False)
-                set_bool_in_geometry_nodes(node, "enable_in_foreground_render",False)
+        self.node_toggles.set_many(all_disabled)
+
+        if self.emet_tool.use_single_pass_stages:
+            if is_stage_split_supported(self.scene):
+                try:
+                    self._render_environment_single_pass(output_filename, bool_map_for_stages)
+                    return
+                except StageSplitUnsupported as e:
+                    self.report({"WARNING"}, f"{e}. Rendering stages separately")
+            else:
+                self.report({"WARNING"}, "Objects with geometry nodes placed directly in scene collection can't be split into view layers. Rendering stages separately")
 
         # Main render loop
         for stage in render_stages:
-            for node in bpy.data.node_groups:
-                    set_bool_in_geometry_nodes(node, bool_map_for_stages[stage], True)
+            # Previous stage is switched off and this one on in one go
+            self.node_toggles.set_many({**all_disabled, bool_map_for_stages[stage]: True})
             self.scene.render.filepath = os.path.abspath(os.path.join(self.output_directory, f"{output_filename}_{stage}.png" ))
 
             bpy.ops.render.render(animation=False, write_still=True, use_viewport=False, layer='', scene='')
 
-            for node in bpy.data.node_groups:
-                    set_bool_in_geometry_nodes(node, bool_map_for_stages[stage], False)
-
         # Reset all nodes
-        for node in bpy.data.node_groups:
-                set_bool_in_geometry_nodes(node, "enable_in_background_render",False)
-                set_bool_in_geometry_nodes(node, "enable_in_collision_render" ,False)
-                set_bool_in_geometry_nodes(node, "enable_in_foreground_render",False)
-            
+        self.node_toggles.set_many(all_disabled)
 
-        # Reset all nodes
-        for node in bpy.data.node_groups:
-                set_bool_in_geometry_nodes(node, "enable_in_background_render",False)
-                set_bool_in_geometry_nodes(node, "enable_in_collision_render" ,False)
-                set_bool_in_geometry_nodes(node, "enable_in_foreground_render",False)
+    def _render_environment_single_pass(self, output_filename, bool_map_for_stages):
+        stage_layers = StageLayers(self.scene, self.context.view_layer, self.node_toggles, bool_map_for_stages, self.output_tmp_directory)
+        try:
+            output_paths = stage_layers.render()
+        finally:
+            stage_layers.teardown()
+        for stage, path in output_paths.items():
+            os.replace(path, os.path.join(self.output_directory, f"{output_filename}_{stage}.png"))
 
     def _render_tile(self, iteration):
-        foreground_affix = self.scene.TileMixer.foreground_affix 
-        background_affix = self.scene.TileMixer.background_affix 
         object_dict = self.context.scene.TileCollectionPointer.objects
 
         output_filename = self.emet_tool.output_filename[:-4]
@@ -404,6 +1106,27 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
         # Sort by key
         tile_dict = dict(sorted(tile_dict.items()))
 
+        render_array = []
+        tile_renders = None
+        if self.scene.TileMixer.use_batch_render:
+            tile_renders = self._render_tiles_batched(tile_dict)
+            if tile_renders == None:
+                self.report({"WARNING"}, "Tiles can't be rendered in one frame, camera has to be orthographic and tiles placed on whole pixels without overlapping. Rendering them separately")
+        if tile_renders == None:
+            tile_renders = self._render_tiles_separately(tile_dict)
+        for renders in tile_renders:
+            if len(renders) != 0:
+                render_array.append(renders)
+
+        cv2.imwrite(os.path.join(self.output_directory, output_filename), cv2.vconcat(render_array))
+
+    def _render_tiles_separately(self, tile_dict):
+        # One render per tile object, returns background and foreground strips
+        foreground_affix = self.scene.TileMixer.foreground_affix 
+        background_affix = self.scene.TileMixer.background_affix 
+        # Files written by renders below, in render order. Dictionary to keep it ordered and unique
+        rendered_paths = {}
+
         # Hide all objects
         for key in tile_dict.keys():
             current_tile = tile_dict[key]
@@ -424,27 +1147,28 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
                 if background_affix in object.name:
                     for temp_object in current_tile:
                         if 'GeometryNodes' in temp_object.modifiers.keys():
-                            set_bool_in_objects_geometry_nodes(temp_object, 'enable_in_background_render', True)
+                            self.node_toggles.set_in_group(temp_object.modifiers['GeometryNodes'].node_group, BACKGROUND_TOGGLE, True)
                     self.scene.render.filepath = os.path.abspath(os.path.join(self.output_tmp_background_directory, str(key)))
                     
                 if foreground_affix in object.name:
                     for temp_object in current_tile:
                         if 'GeometryNodes' in temp_object.modifiers.keys():
-                            set_bool_in_objects_geometry_nodes(temp_object, 'enable_in_foreground_render', True)
+                            self.node_toggles.set_in_group(temp_object.modifiers['GeometryNodes'].node_group, FOREGROUND_TOGGLE, True)
                     self.scene.render.filepath = os.path.abspath(os.path.join(self.output_tmp_foreground_directory, str(key)))
 
                 bpy.ops.render.render(animation=False, write_still=True, use_viewport=False, layer='', scene='')
+                rendered_paths[self.scene.render.filepath + self.scene.render.file_extension] = None
                 
                 # Cleanup
                 if background_affix in object.name:
                     for temp_object in current_tile:
                         if 'GeometryNodes' in temp_object.modifiers.keys():
-                            set_bool_in_objects_geometry_nodes(temp_object, 'enable_in_background_render', False)
+                            self.node_toggles.set_in_group(temp_object.modifiers['GeometryNodes'].node_group, BACKGROUND_TOGGLE, False)
                     
                 if foreground_affix in object.name:
                     for temp_object in current_tile:
                         if 'GeometryNodes' in temp_object.modifiers.keys():
-                            set_bool_in_objects_geometry_nodes(temp_object, 'enable_in_foreground_render', False)
+                            self.node_toggles.set_in_group(temp_object.modifiers['GeometryNodes'].node_group, FOREGROUND_TOGGLE, False)
 
                 object.hide_render = True
 
@@ -453,31 +1177,118 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
             for object in current_tile:
                 object.hide_render = False
 
-        render_array = []
-
-        background_renders = []
-        foreground_renders = []
-        background_renders = combine_frames( self.output_tmp_background_directory, '')
-        if len(background_renders) != 0:
-            render_array.append(background_renders)
+        background_paths = [x for x in rendered_paths.keys() if os.path.dirname(x) == self.output_tmp_background_directory]
+        foreground_paths = [x for x in rendered_paths.keys() if os.path.dirname(x) == self.output_tmp_foreground_directory]
+        return [combine_frames(background_paths), combine_frames(foreground_paths)]
 
-        foreground_renders = combine_frames( self.output_tmp_foreground_directory, '')
-        if len(foreground_renders) != 0:
-            render_array.append(foreground_renders)
+    def _tile_batch_plan(self, tile_dict, affix):
+        # Tiles having object with affix and their pixel offsets, None when they can't share a frame
+        keys = []
+        locations = []
+        for key in tile_dict.keys():
+            affix_objects = [x for x in tile_dict[key] if affix in x.name]
+            if len(affix_objects) == 0:
+                continue
+            keys.append(key)
+            # Separate render of the last object overwrites the others
+            locations.append((affix_objects[-1].location.x, affix_objects[-1].location.y))
+        offsets = tile_pixel_offsets(self.scene, self.camera, locations)
+        if offsets == None:
+            return None
+        width, height = tile_frame_size(self.scene)
+        if has_overlapping_tiles(offsets, width, height):
+            return None
+        return keys, offsets
+
+    def _render_tiles_batched(self, tile_dict):
+        # All background tiles in one (or few, when huge) frames, same for foreground, sliced back to tiles
+        if not is_batch_supported(self.scene, self.camera):
+            return None
+        passes = [
+            (self.scene.TileMixer.background_affix, BACKGROUND_TOGGLE, self.output_tmp_background_directory),
+            (self.scene.TileMixer.foreground_affix, FOREGROUND_TOGGLE, self.output_tmp_foreground_directory),
+        ]
+        plans = [self._tile_batch_plan(tile_dict, affix) for affix, _, _ in passes]
+        if None in plans:
+            return None
 
-        cv2.imwrite(os.path.join(self.output_directory, output_filename), cv2.vconcat(render_array))
+        for key in tile_dict.keys():
+            for object in tile_dict[key]:
+                object.hide_render = True
+        self.camera.location.x = self.camera_location_cache.x
+        self.camera.location.y = self.camera_location_cache.y
+        width, height = tile_frame_size(self.scene)
+
+        renders = []
+        for (affix, toggle, directory), (keys, offsets) in zip(passes, plans):
+            tiles = [None] * len(keys)
+            for group_index, group in enumerate(group_tiles(offsets, width, height)):
+                for i in group:
+                    for object in tile_dict[keys[i]]:
+                        if affix in object.name:
+                            object.hide_render = False
+                        if 'GeometryNodes' in object.modifiers.keys():
+                            self.node_toggles.set_in_group(object.modifiers['GeometryNodes'].node_group, toggle, True)
+
+                batch_frame = BatchFrame(self.scene, self.camera, [offsets[i] for i in group])
+                try:
+                    self.scene.render.filepath = os.path.abspath(os.path.join(directory, f"batch_{group_index}"))
+                    bpy.ops.render.render(animation=False, write_still=True, use_viewport=False, layer='', scene='')
+                    frame_path = self.scene.render.filepath + self.scene.render.file_extension
+                finally:
+                    batch_frame.restore()
+                frame = read_frame(frame_path)
+                os.remove(frame_path)
+                for i in group:
+                    tiles[i] = batch_frame.slice(frame, offsets[i])
+
+                for i in group:
+                    for object in tile_dict[keys[i]]:
+                        object.hide_render = True
+                        if 'GeometryNodes' in object.modifiers.keys():
+                            self.node_toggles.set_in_group(object.modifiers['GeometryNodes'].node_group, toggle, False)
+            renders.append(np.hstack(tiles) if len(tiles) > 0 else [])
 
+        for key in tile_dict.keys():
+            for object in tile_dict[key]:
+                object.hide_render = False
+        return renders
+
+
+    def _render_animation(self, iteration):
+        self._setup_orbit_cameras()
+        for character in self.characters:
+            self._select_character(character)
+            for _ in self._render_animation_steps(iteration):
+                pass
+
+    def _select_character(self, character):
+        self.character = character
+        self.actions_prop_coll = character.actions
+        if self.character_isolation != None:
+            self.character_isolation.select(character)
+
+    def _setup_orbit_cameras(self):
+        self.camera_orbit_radii = []
+        for camera in self._orbit_cameras():
+            x, y = camera.location.x, camera.location.y
+            camera_vector_mag = math.sqrt(math.pow(x, 2) + math.pow(y, 2))
+            self.camera_orbit_radii.append(camera_vector_mag)
+            camera.location.x = camera_vector_mag * 1 # Yes this is very verbose - sue me # Its cute but it wont stop my sphagetti
+            camera.location.y = 0
+            camera.rotation_euler[2] = math.pi / 2
 
-    def _render_animation(self,iteration):
+    def _render_animation_steps(self,iteration):
 
-        render_object = self.scene.CharacterPointer
-        max_render_length = self.scene.MaxRenderLength
-        export_info_json = self.scene.OutputJsonExplainingRender
+        render_object = self.character.character
+        file_prefix = self.character.file_prefix
         bg_fg_enabled = self.emet_tool.enable_bg_fg_render
         render_rotations = self.emet_tool.rotations
-        output_filename = self.emet_tool.output_filename[:-4]
+        output_filename = file_prefix + self.emet_tool.output_filename[:-4]
+        self.unit_file_names = (output_filename, output_filename)
         if iteration > 0:
             output_filename = f"{output_filename}_{iteration+1}"
+            self.unit_file_names = (output_filename, self.unit_file_names[1])
     
         # We set render filepath to temp tiles directory + prefix. All intermediate tiles will be stored in temp directory,
         # with name prefix + tile number
@@ -485,29 +1296,25 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
         self.scene.render.filepath = self.output_tmp_filename
 
         physics_animation_dictionary = {}
-        render_target = {}
-        # Key is prop name/file name and value is animation 
-        render_target_prop_anim = {} # Render target animation that has prop will be rendered separately
-        render_prop_anim = {} # Prop doing animation on its own
-        render_physics_prop_anim = {} # Prop doing animation on its own
-        render_wearable = {}
 
         # Prepare Props animation
-        # - Hide prop
-        bpy.context.scene.PropCollectionPointer.hide_render = True
+        # - Hide prop, view layers hide it on their own
+        use_view_layer_visibility = self.emet_tool.use_view_layer_visibility
+        if not use_view_layer_visibility and self.character.prop_collection != None:
+            self.character.prop_collection.hide_render = True
         for actions_mixer_row in self.actions_prop_coll:
             prop_name = actions_mixer_row.prop_for_action_name
             # Setup Rendering Arrays
             action_name = actions_mixer_row.character_action_name
             is_attack_render = actions_mixer_row.is_attack_render
-            is_animated = True
             current_prop = None
             if actions_mixer_row.prop_for_action_name != 'None':
                 current_prop = bpy.data.objects[actions_mixer_row.prop_for_action_name]
 
             # - Create 36fps versions of animations
             if current_prop != None: # KURWAAAAAA BLENDER HAS 'None' and None  # KURWAAA its not blender, its us in @ref action_mixer.py
-                set_object_scale_to_zero(bpy.data.objects[prop_name])
+                if not use_view_layer_visibility:
+                    set_object_scale_to_zero(bpy.data.objects[prop_name])
                 reset_animations(current_prop)
 
                 # Prepare physics animations
@@ -519,11 +1326,11 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
                         slot.select = True
                         for i,curve in enumerate(physics_animation.fcurves):
                             for j, kfp in enumerate(curve.keyframe_points):
-                                physics_animation.fcurves[i].keyframe_points[j].co_ui.x = kfp.co_ui.x * 3.0
+                                physics_animation.fcurves[i].keyframe_points[j].co_ui.x = kfp.co_ui.x * float(ATTACK_FRAME_MULTIPLIER)
                                 physics_animation.fcurves[i].keyframe_points[j].interpolation = 'BEZIER'
                                 #kfp.co.x = kfp.co.x * 3
                         slot.select = False
-                    physics_animation.frame_end = physics_animation.frame_end * 3
+                    physics_animation.frame_end = physics_animation.frame_end * ATTACK_FRAME_MULTIPLIER
                 physics_animation_dictionary[action_name] = physics_animation
         
         # Decide how many render passes we will do 
@@ -531,242 +1338,234 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
         if bg_fg_enabled:
             render_types = ['Background', 'Foreground']
             # Reset Everything
-            for node in bpy.data.node_groups:
-                    set_bool_in_geometry_nodes(node, 'enable_in_background_render', False)
-                    set_bool_in_geometry_nodes(node, 'enable_in_foreground_render', False)
-        if bpy.context.scene.WearableCollectionPointer is not None:
+            self.node_toggles.set_many({BACKGROUND_TOGGLE: False, FOREGROUND_TOGGLE: False})
+        # Background and Foreground passes land in the same strip, one after another
+        pass_count = len(render_types)
+        if self.character.wearable_collection is not None:
             render_types.append('Wearable')
 
+        # Key is prop name/file name and value is animation 
+        render_target = StripStore(pass_count * render_rotations, "target", self.strip_budget)
+        render_target_prop_anim = StripStore(pass_count * render_rotations, "target_prop_anim", self.strip_budget) # Render target animation that has prop will be rendered separately
+        render_prop_anim = StripStore(render_rotations, "prop_anim", self.strip_budget) # Prop doing animation on its own
+        render_physics_prop_anim = StripStore(render_rotations, "physics_prop_anim", self.strip_budget) # Prop doing animation on its own
+        render_wearable = StripStore(render_rotations, "wearable", self.strip_budget)
+
         if 'Wearable' in render_types:
-            wearable_dict = self.context.scene.WearableCollectionPointer.objects
-            self.context.scene.WearableCollectionPointer.hide_render = True
+            wearable_dict = self.character.wearable_collection.objects
+            if not use_view_layer_visibility:
+                self.character.wearable_collection.hide_render = True
             for key in wearable_dict.keys():
                 wearable = wearable_dict[key]
-                set_object_scale_to_zero(wearable)
-                wearable.hide_render = True
+                if not use_view_layer_visibility:
+                    set_object_scale_to_zero(wearable)
+                    wearable.hide_render = True
                 reset_animations(wearable)
         
-
-        # Prepare
-        # We will store background render and foreground renders here
-
-        # Main Loop
-        for render_type in render_types:
-
-            for node in bpy.data.node_groups:
-                if render_type == 'Background':
-                    set_bool_in_geometry_nodes(node, 'enable_in_background_render', True)
-                if render_type == 'Foreground':
-                    set_bool_in_geometry_nodes(node, 'enable_in_foreground_render', True)
-                if render_type == 'Wearable':
-                    set_bool_in_geometry_nodes(node, 'enable_in_background_render', True)
-                    set_bool_in_geometry_nodes(node, 'enable_in_foreground_render', True)
-            if render_type == 'Wearable':
-                set_holdout_to_object(render_object, True)
-
-            # Setup camera
-            x, y = self.camera.location.x, self.camera.location.y
-            camera_vector_mag = math.sqrt(math.pow(x, 2) + math.pow(y, 2))
-            self.camera.location.x = camera_vector_mag * 1 # Yes this is very verbose - sue me # Its cute but it wont stop my sphagetti
-            self.camera.location.y = 0
-            self.camera.rotation_euler[2] = math.pi / 2
-            camera_rotation_angle = math.pi * 2.0 / render_rotations
-
+        # List every strip we render with scene state it needs
+        units = []
+        for pass_index, render_type in enumerate(render_types):
+            toggles = self._render_type_toggles(render_type)
             for actions_mixer_row in self.actions_prop_coll:
                 action_name = actions_mixer_row.character_action_name
                 is_attack_render = actions_mixer_row.is_attack_render
-                is_animated = True
                 current_prop = None
                 if actions_mixer_row.prop_for_action_name != 'None':
                     current_prop = bpy.data.objects[actions_mixer_row.prop_for_action_name]
 
-                setup_animations(self.scene, render_object, None, action_name)
-
-
-                # Render rotations
-                for _ in range(0, render_rotations):
-                    # Rotate camera around it's Z axis
-                    self.camera.rotation_euler[2] += camera_rotation_angle
-
-                    # Rotate camera position vector
-                    x, y = self.camera.location.x, self.camera.location.y
-                    self.camera.location.x = x * math.cos(camera_rotation_angle) - y * math.sin(camera_rotation_angle)
-                    self.camera.location.y = x * math.sin(camera_rotation_angle) + y * math.cos(camera_rotation_angle)
-
-                    if render_type != 'Wearable':
-                        set_holdout_to_object(render_object, False)
-                        # Render H strip
-                        bpy.ops.render.render(
-                            animation=is_animated,
-                            write_still=True,
-                            use_viewport=False,
-                            layer='',
-                            scene=''
-                        )
-
-                        if current_prop == None:
-                            hstrip = combine_frames(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                            # here output_filename is as constant to keep parity with other rendering dictionaries
-                            if output_filename not in render_target.keys():
-                                render_target[output_filename] = {}
-                            if action_name not in render_target[output_filename].keys():
-                                render_target[output_filename][action_name] = hstrip
-                            else:
-                                render_target[output_filename][action_name] = cv2.vconcat([render_target[output_filename][action_name], hstrip])
-                            self._cleanup(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-
-                        else:
-                            bpy.context.scene.PropCollectionPointer.hide_render = False
-                            # Save prop animation to different buffer
-                            hstrip = combine_frames(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                            render_target_key = output_filename + "_" + current_prop.name
-                            if render_target_key not in render_target_prop_anim.keys():
-                                render_target_prop_anim[render_target_key] = {}
-                            if action_name not in render_target_prop_anim[render_target_key].keys():
-                                render_target_prop_anim[render_target_key][action_name] = hstrip
-                            else:
-                                render_target_prop_anim[render_target_key][action_name] = cv2.vconcat([render_target_prop_anim[render_target_key][action_name], hstrip])
-
-                            self._cleanup(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-
-                            if render_type == 'Background':
-                                # Save prop animation to different buffer
-
-                                # Set things up for prop rendering
-                                set_object_scale_to_one(current_prop)
-                                set_holdout_to_object(render_object, True)
-                                current_prop.hide_render = False
-                                setup_animations(self.scene, render_object, current_prop, action_name)
-
-                                bpy.ops.render.render(
-                                    animation=is_animated,
-                                    write_still=True,
-                                    use_viewport=False,
-                                    layer='',
-                                    scene=''
-                                )
-                                hstrip = combine_frames(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                                if current_prop.name not in render_prop_anim.keys():
-                                    render_prop_anim[current_prop.name] = {}
-                                if action_name not in render_prop_anim[current_prop.name].keys():
-                                    render_prop_anim[current_prop.name][action_name] = hstrip
-                                else:
-                                    render_prop_anim[current_prop.name][action_name] = cv2.vconcat([render_prop_anim[current_prop.name][action_name], hstrip])
-                                self._cleanup(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                                if is_attack_render == True:
-                                    # Now render same prop for physics calculations
-                                    previous_action = render_object.animation_data.action 
-                                    previous_frame_end = self.scene.frame_end
-
-                                    current_prop.hide_render = False
-                                    setup_animations(self.scene, render_object, current_prop, physics_animation_dictionary[action_name].name)
-
-                                    bpy.ops.render.render(
-                                        animation=is_animated,
-                                        write_still=True,
-                                        use_viewport=False,
-                                        layer='',
-                                        scene=''
-                                    )
-
-                                    render_object.animation_data.action = previous_action
-                                    self.scene.frame_end = previous_frame_end 
-                                    hstrip = combine_frames(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                                    if current_prop.name not in render_physics_prop_anim.keys():
-                                        render_physics_prop_anim[current_prop.name] = {}
-                                    if action_name not in render_physics_prop_anim[current_prop.name].keys():
-                                        render_physics_prop_anim[current_prop.name][action_name] = hstrip
-                                    else:
-                                        render_physics_prop_anim[current_prop.name][action_name] = cv2.vconcat([render_physics_prop_anim[current_prop.name][action_name], hstrip])
-                                    self._cleanup(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-
-                                set_holdout_to_object(render_object, False)
-                                reset_animations(current_prop)
-                                set_object_scale_to_zero(current_prop)
-                                current_prop.hide_render = True 
-                                bpy.context.scene.PropCollectionPointer.hide_render = True
-
-                    if render_type == 'Wearable':
-                        wearable_dict = self.context.scene.WearableCollectionPointer.objects
-                        self.context.scene.WearableCollectionPointer.hide_render = False
-                        for key in wearable_dict.keys():
-                            wearable = wearable_dict[key]
-                            set_holdout_to_object(render_object, True)
-                            wearable.hide_render = False
-                            setup_animations(self.scene, render_object, wearable, action_name)
-                            set_object_scale_to_one(wearable)
-                            bpy.ops.render.render(
-                                animation=is_animated,
-                                write_still=True,
-                                use_viewport=False,
-                                layer='',
-                                scene=''
-                            )
-                            hstrip = combine_frames(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                            if wearable.name not in render_wearable.keys():
-                                render_wearable[wearable.name] = {}
-                            if action_name not in render_wearable[wearable.name].keys():
-                                render_wearable[wearable.name][action_name] = hstrip
-                            else:
-                                render_wearable[wearable.name][action_name] = cv2.vconcat([render_wearable[wearable.name][action_name], hstrip])
-
-                            reset_animations(wearable)
-                            set_object_scale_to_zero(wearable)
-                            set_holdout_to_object(render_object, False)
-                            wearable.hide_render = True
-
-                            self._cleanup(self.output_tmp_tiles_directory, self.TILE_PREFIX)
-                        self.context.scene.WearableCollectionPointer.hide_render = True
-
-
-            # Unset all nodes variables and all holdouts
-            for node in bpy.data.node_groups:
-                if render_type == 'Background':
-                    set_bool_in_geometry_nodes(node, 'enable_in_background_render', False)
-                if render_type == 'Foreground':
-                    set_bool_in_geometry_nodes(node, 'enable_in_foreground_render', False)
-            if render_type == 'Wearable':
-                set_holdout_to_object(render_object, False)
-                wearable_dict = self.context.scene.WearableCollectionPointer.objects
-                for key in wearable_dict.keys():
-                    wearable = wearable_dict[key]
+                if render_type != 'Wearable':
+                    if current_prop == None:
+                        # here output_filename is as constant to keep parity with other rendering dictionaries
+                        units.append(RenderUnit(UnitState(toggles, None, False, action_name), render_target, output_filename, action_name, pass_index, actions_mixer_row))
+                    else:
+                        # Save prop animation to different buffer
+                        render_target_key = output_filename + "_" + current_prop.name
+                        units.append(RenderUnit(UnitState(toggles, None, False, action_name), render_target_prop_anim, render_target_key, action_name, pass_index, actions_mixer_row))
+                        if render_type == 'Background':
+                            prop_state = UnitState(toggles, ("prop", current_prop.name), True, action_name)
+                            units.append(RenderUnit(prop_state, render_prop_anim, file_prefix + current_prop.name, action_name, 0, actions_mixer_row))
+                            if is_attack_render == True:
+                                # Now render same prop for physics calculations
+                                physics_state = UnitState(toggles, ("prop", current_prop.name), True, physics_animation_dictionary[action_name].name)
+                                units.append(RenderUnit(physics_state, render_physics_prop_anim, file_prefix + current_prop.name, action_name, 0, actions_mixer_row, True, len(units) - 1))
+                else:
+                    for key in self.character.wearable_collection.objects.keys():
+                        wearable_state = UnitState(toggles, ("wearable", key), True, action_name)
+                        units.append(RenderUnit(wearable_state, render_wearable, file_prefix + key, action_name, 0, actions_mixer_row))
+
+        planned_units = plan_units(units)
+        self.report({"INFO"}, f"Render plan: {count_transitions(planned_units)} scene state changes instead of {count_transitions(units)}")
+        if use_view_layer_visibility:
+            self._setup_visibility_layers(planned_units, render_object)
+
+        # Main Loop
+        self.unit_state = None
+        for unit in planned_units:
+            self._apply_unit_state(unit.state, render_object)
+            world_corners = None
+            if self._is_auto_border_enabled():
+                world_corners = self._action_world_corners(unit.actions_mixer_row, render_object)
+            # Mirrored rotations will be flipped from their mirror rotation once all rotations are rendered
+            mirror_sources = self._mirror_sources(unit.actions_mixer_row)
+            rendered_rotations = [x for x in range(0, render_rotations) if mirror_sources[x] == None]
+
+            base_row_for = partial(self._physics_base_row, render_prop_anim, unit.file_name, unit.action_name) if unit.is_physics else None
+            yield from self._render_rotations(unit.strip_store, unit.file_name, unit.action_name, unit.pass_index, rendered_rotations, world_corners, base_row_for)
+
+        # Unset all nodes variables and all holdouts
+        self._apply_unit_state(UnitState(self._render_type_toggles(None), None, False, self.unit_state.action if self.unit_state != None else None), render_object)
+        self.unit_state = None
+        if use_view_layer_visibility:
+            self._teardown_visibility_layers()
+        else:
+            if 'Wearable' in render_types:
+                for wearable in self.character.wearable_collection.objects:
                     set_object_scale_to_one(wearable)
             for actions_mixer_row in self.actions_prop_coll:
                 prop_name = actions_mixer_row.prop_for_action_name
                 if prop_name != 'None': 
                     set_object_scale_to_one(bpy.data.objects[prop_name])
-        if len(render_target.keys()) > 0:
-            create_images_from_dict(render_target, ".png", self.output_directory, max_render_length)
-            if export_info_json:
-                create_json_from_dict(render_target, bpy.data, self.scene, render_rotations, bg_fg_enabled, "", self.output_directory, max_render_length)
-
-        if len(render_target_prop_anim.keys()) > 0:
-            create_images_from_dict(render_target_prop_anim, ".png", self.output_directory, max_render_length)
-            if export_info_json:
-                create_json_from_dict(render_target_prop_anim, bpy.data, self.scene, render_rotations, bg_fg_enabled, "", self.output_directory, max_render_length)
-
-        if len(render_physics_prop_anim.keys()) > 0:
-            create_images_from_dict(render_physics_prop_anim, "_attack.png", self.output_directory, max_render_length)
-            if export_info_json:
-                create_json_from_dict(render_physics_prop_anim, bpy.data, self.scene, render_rotations, False, "_attack", self.output_directory, max_render_length)
-
-        if len(render_prop_anim.keys()) > 0:
-            create_images_from_dict(render_prop_anim, ".png", self.output_directory, max_render_length)
-            if export_info_json:
-                create_json_from_dict(render_prop_anim, bpy.data, self.scene, render_rotations, False, "", self.output_directory, max_render_length)
-
-        if len(render_wearable.keys()) > 0:
-            create_images_from_dict(render_wearable, ".png", self.output_directory, max_render_length)
-            if export_info_json:
-                create_json_from_dict(render_wearable, bpy.data, self.scene, render_rotations, False, "", self.output_directory, max_render_length)
+
+        # Synthesise mirrored rotations
+        self._wait_for_post_processing()
+        frame_width = int(self.scene.render.resolution_x * self.scene.render.resolution_percentage / 100)
+        for unit in units:
+            mirror_sources = self._mirror_sources(unit.actions_mixer_row)
+            for rotation, source in enumerate(mirror_sources):
+                if source == None or not unit.strip_store.has_row(unit.file_name, unit.action_name):
+                    continue
+                source_row = unit.pass_index * render_rotations + source
+                pass_row = unit.pass_index * render_rotations + rotation
+                unit.strip_store.mirror_row(unit.file_name, unit.action_name, source_row, pass_row, frame_width)
+
+        self._export_render_dict(render_target.strips, "", bg_fg_enabled)
+        self._export_render_dict(render_target_prop_anim.strips, "", bg_fg_enabled)
+        self._export_render_dict(render_physics_prop_anim.strips, "_attack", False)
+        self._export_render_dict(render_prop_anim.strips, "", False)
+        self._export_render_dict(render_wearable.strips, "", False)
             
+        if self.render_cache != None:
+            self.report({"INFO"}, f"Render cache: {self.render_cache.hits} strips reused, {self.render_cache.misses} rendered")
+        if self.checkpoint != None and self.checkpoint.resumed_units > 0:
+            self.report({"INFO"}, f"Resumed render: {self.checkpoint.resumed_units} strips taken from interrupted job")
+
         # Now we will delete unused actions:
-        for key in bpy.data.actions.keys():
-            if "PREFIX_FOR_DELETION" in key:
-                bpy.data.actions.remove(bpy.data.actions[key])
+        self._remove_temporary_actions()
         
 
 
+    def _render_type_toggles(self, render_type):
+        # Node toggles render type needs, None is state after animation render
+        if render_type == 'Background':
+            if self.emet_tool.enable_bg_fg_render:
+                return ((BACKGROUND_TOGGLE, True), (FOREGROUND_TOGGLE, False))
+            return ((BACKGROUND_TOGGLE, True),)
+        if render_type == 'Foreground':
+            return ((BACKGROUND_TOGGLE, False), (FOREGROUND_TOGGLE, True))
+        if render_type == 'Wearable':
+            return ((BACKGROUND_TOGGLE, True), (FOREGROUND_TOGGLE, True))
+        if self.emet_tool.enable_bg_fg_render:
+            return ((BACKGROUND_TOGGLE, False), (FOREGROUND_TOGGLE, False))
+        return ((BACKGROUND_TOGGLE, False),)
+
+    def _visible_object(self, visible):
+        kind, name = visible
+        if kind == "prop":
+            return bpy.data.objects[name], self.character.prop_collection
+        return self.character.wearable_collection.objects[name], self.character.wearable_collection
+
+    def _setup_visibility_layers(self, units, render_object):
+        visible_objects = {}
+        states = [(None, False)] # State everything is reset to after the last unit
+        for unit in units:
+            if unit.state.visible != None and unit.state.visible not in visible_objects.keys():
+                visible_objects[unit.state.visible] = self._visible_object(unit.state.visible)
+            if (unit.state.visible, unit.state.holdout) not in states:
+                states.append((unit.state.visible, unit.state.holdout))
+        holdout_objects = list(render_object.children) if render_object.type == 'ARMATURE' else [render_object]
+        self.visibility_layers = VisibilityLayers(self.scene, self.context.view_layer, holdout_objects, visible_objects, states)
+
+    def _teardown_visibility_layers(self):
+        if self.visibility_layers != None:
+            self.visibility_layers.teardown()
+            self.visibility_layers = None
+
+    def _apply_unit_state(self, state, render_object):
+        # Changes only parts of the scene state that differ from state of previous unit
+        previous = self.unit_state
+        changes = state.changes(previous)
+        if "toggles" in changes:
+            self.node_toggles.set_many(dict(state.toggles))
+        if self.visibility_layers != None:
+            if "visible" in changes or "holdout" in changes:
+                self.visibility_layers.activate(state.visible, state.holdout)
+            if "visible" in changes and previous != None and previous.visible != None:
+                reset_animations(self._visible_object(previous.visible)[0])
+        elif "visible" in changes:
+            if previous != None and previous.visible != None:
+                obj, collection = self._visible_object(previous.visible)
+                reset_animations(obj)
+                set_object_scale_to_zero(obj)
+                obj.hide_render = True
+                collection.hide_render = True
+            if state.visible != None:
+                obj, collection = self._visible_object(state.visible)
+                collection.hide_render = False
+                obj.hide_render = False
+                set_object_scale_to_one(obj)
+        if "holdout" in changes and self.visibility_layers == None:
+            set_holdout_to_object(render_object, state.holdout)
+        if ("action" in changes or "visible" in changes) and state.action != None:
+            visible_object = None
+            if state.visible != None:
+                visible_object = self._visible_object(state.visible)[0]
+            setup_animations(self.scene, render_object, visible_object, state.action)
+        self.unit_state = state
+
+    def _render_animation_farm(self, target_cameras):
+        farm_directory = os.path.join(self.output_tmp_directory, "farm")
+        unit_directories = run_farm(self.scene, farm_directory, len(target_cameras), self.emet_tool.render_workers, self.characters, self.emet_tool.use_character_batch)
+        action_order = [x.character_action_name for character in self.characters for x in character.actions]
+        render_groups = collect_unit_strips(unit_directories, action_order)
+        for (affix_filename, has_fg_bg), render_dict in render_groups.items():
+            self._export_render_dict(render_dict, affix_filename, has_fg_bg)
+
+    def _mirror_sources(self, actions_mixer_row):
+        if not actions_mixer_row.is_mirror_symmetric:
+            return [None] * self.emet_tool.rotations
+        return mirror_source_rotations(self.emet_tool.rotations, self.emet_tool.mirror_axis)
+
+    def _action_json_data(self):
+        # Extra per action information for json, rotations listed here were mirrored instead of rendered
+        action_data = {}
+        # Farm coordinator exports sheets of all characters at once
+        for actions_mixer_row in [x for character in self.characters for x in character.actions]:
+            mirror_sources = self._mirror_sources(actions_mixer_row)
+            mirrored = [[rotation, source] for rotation, source in enumerate(mirror_sources) if source != None]
+            if len(mirrored) > 0:
+                action_data[actions_mixer_row.character_action_name] = {"mirrored_rotations": mirrored}
+        return action_data
+
+    def _export_render_dict(self, render_dict, affix_filename, has_fg_bg):
+        if len(render_dict.keys()) == 0:
+            return
+        self._wait_for_post_processing()
+        if self.farm_unit != None:
+            # Worker only hands strips over, coordinator assembles sheets
+            save_unit_strips(self.output_directory, render_dict, affix_filename, has_fg_bg)
+            return
+        render = self.scene.render
+        frame_size = (int(render.resolution_x * render.resolution_percentage / 100), int(render.resolution_y * render.resolution_percentage / 100))
+        layouts = create_layouts_from_dict(render_dict, self.scene.MaxRenderLength, frame_size, self.emet_tool.use_frame_dedup, self.emet_tool.use_tight_packing)
+        if self.emet_tool.use_frame_dedup:
+            unique_count = sum(len(x.sources) for x in layouts.values())
+            frame_count = sum(x.frame_count for x in layouts.values())
+            self.report({"INFO"}, f"Sheets store {unique_count} unique frames out of {frame_count}")
+        # Encoding sheets doesn't need Blender, it overlaps with next camera renders
+        self._submit_post_processing(create_images_from_dict, render_dict, layouts, affix_filename + ".png", self.output_directory, self.strip_budget != None)
+        if self.scene.OutputJsonExplainingRender:
+            create_json_from_dict(render_dict, layouts, bpy.data, self.scene, self.emet_tool.rotations, has_fg_bg, affix_filename, self.output_directory, self._action_json_data())
+
     def _cache_camera_pos(self):
         self.camera_location_cache = deepcopy(self.camera.location)
         self.camera_rotation_cache = deepcopy(self.camera.rotation_euler)
@@ -777,28 +1576,40 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
 
 
         # User provides output directory, which **must** exist. Here will be the output file placed
-        if not os.path.exists(self.emet_tool.output_directory):
+        if self.farm_unit != None:
+            # Render farm worker keeps everything in its unit directory, coordinator writes outputs
+            self.output_directory = os.path.abspath(self.farm_unit["output_directory"])
+            os.makedirs(self.output_directory, exist_ok=True)
+        elif not os.path.exists(self.emet_tool.output_directory):
             error_msg = f"Output directory: {self.emet_tool.output_directory} does not exist!"
             self.report({"ERROR"}, error_msg)
             raise RuntimeError(error_msg)
-        self.output_directory = os.path.abspath(self.emet_tool.output_directory)
+        else:
+            self.output_directory = os.path.abspath(self.emet_tool.output_directory)
 
         # Create temporary directory to store outputs. It will contain two subdirectories to store tiles and strips
         # separately, to ease joining them together later
-        self.output_tmp_directory = os.path.join(self.output_directory, f"tmp-render-{datetime.datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}")
+        resumed_directory = None
+        if self.farm_unit == None and self.emet_tool.resume_render and self.emet_tool.selected_render == animation_render:
+            resumed_directory = find_resumable_job(self.output_directory, self.TMP_DIRECTORY_PREFIX, self._job_signature())
+        if resumed_directory != None:
+            self.output_tmp_directory = resumed_directory
+        else:
+            self.output_tmp_directory = os.path.join(self.output_directory, f"{self.TMP_DIRECTORY_PREFIX}{datetime.datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}")
         self.output_tmp_directory = os.path.abspath(self.output_tmp_directory)
         self.output_tmp_tiles_directory = os.path.abspath(os.path.join(self.output_tmp_directory, "tiles"))
         self.output_tmp_strips_directory = os.path.abspath(os.path.join(self.output_tmp_directory, "strips"))
         self.output_tmp_background_directory = os.path.abspath(os.path.join(self.output_tmp_directory, "background"))
         self.output_tmp_shadow_directory = os.path.abspath(os.path.join(self.output_tmp_directory, "shadow"))
         self.output_tmp_foreground_directory = os.path.abspath(os.path.join(self.output_tmp_directory, "foreground"))
+        resumed = resumed_directory != None
         try:
-            os.makedirs(self.output_tmp_directory, exist_ok=False)
-            os.makedirs(self.output_tmp_strips_directory, exist_ok=False)
-            os.makedirs(self.output_tmp_tiles_directory, exist_ok=False)
-            os.makedirs(self.output_tmp_background_directory, exist_ok=False)
-            os.makedirs(self.output_tmp_shadow_directory, exist_ok=False)
-            os.makedirs(self.output_tmp_foreground_directory, exist_ok=False)
+            os.makedirs(self.output_tmp_directory, exist_ok=resumed)
+            os.makedirs(self.output_tmp_strips_directory, exist_ok=resumed)
+            os.makedirs(self.output_tmp_tiles_directory, exist_ok=resumed)
+            os.makedirs(self.output_tmp_background_directory, exist_ok=resumed)
+            os.makedirs(self.output_tmp_shadow_directory, exist_ok=resumed)
+            os.makedirs(self.output_tmp_foreground_directory, exist_ok=resumed)
         except:
             self.report({"ERROR"}, f"Could not create temp directories")
 
@@ -818,6 +1629,94 @@ class EMET_OT_render_tiles_operator(bpy.types.Operator):
             os.remove(filepath)
 
 
+class EMET_OT_render_tiles_modal_operator(EMET_OT_render_tiles_operator):
+    """
+    Same render as EMET_OT_render_tiles_operator, one render unit per timer event,
+    so Blender stays responsive, shows progress and can be cancelled with Esc
+    """
+    bl_idname = "emet.render_tiles_modal_operator"
+    bl_label = "Render in background"
+    bl_options = {'REGISTER'}
+
+    timer = None
+    steps = None
+
+    def invoke(self, context, event):
+        if render_progress["running"]:
+            self.report({"ERROR"}, "Render is already running")
+            return {'CANCELLED'}
+        render_progress["error"] = None
+        try:
+            self._prepare(context)
+            self.steps = self._render_job_steps()
+        except Exception as e:
+            render_progress["error"] = str(e)
+            self.report({"ERROR"}, str(e))
+            self._finish()
+            return {'CANCELLED'}
+
+        render_progress["running"] = True
+        render_progress["cancel_requested"] = False
+        render_progress["done"] = 0
+        render_progress["total"] = self.progress_total
+        render_progress["start_time"] = time.time()
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, max(1, self.progress_total))
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' or render_progress["cancel_requested"]:
+            # Closing generator stops it at last finished unit
+            self.steps.close()
+            self._end_modal(context)
+            self.report({"WARNING"}, "Render cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            next(self.steps)
+        except StopIteration:
+            self._end_modal(context)
+            return {'FINISHED'}
+        except Exception as e:
+            render_progress["error"] = str(e)
+            self.report({"ERROR"}, str(e))
+            self._end_modal(context)
+            return {'FINISHED'}
+
+        render_progress["done"] = self.progress_done
+        context.window_manager.progress_update(self.progress_done)
+        context.workspace.status_text_set(f"Rendering {self.progress_done}/{self.progress_total}, ETA {format_eta()} (Esc to cancel)")
+        self._redraw_panels(context)
+        return {'PASS_THROUGH'}
+
+    def _end_modal(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self._finish()
+        render_progress["running"] = False
+        self._redraw_panels(context)
+
+    def _redraw_panels(self, context):
+        for area in context.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+class EMET_OT_cancel_render_operator(bpy.types.Operator):
+    bl_idname = "emet.cancel_render_operator"
+    bl_label = "Cancel Render"
+
+    def execute(self, context):
+        render_progress["cancel_requested"] = True
+        return {'FINISHED'}
+
+
 class EMET_PT_tiles(bpy.types.Panel):
     bl_label = "Renderer Panel"
     bl_category = "Emet Utils"
@@ -832,6 +1731,8 @@ class EMET_PT_tiles(bpy.types.Panel):
 
         layout.prop(EmetTool, "rotations")
         layout.prop(EmetTool, "enable_bg_fg_render")
+        layout.label(text="Character Mirror Symmetry")
+        layout.prop(EmetTool, "mirror_axis")
         # Commenting this out, maybe this will be usefull in future
         #layout.label(text="Shadow Catcher Material")
         #layout.prop(context.scene , "ShadowMaterialPointer" , text="")
@@ -843,14 +1744,39 @@ class EMET_PT_tiles(bpy.types.Panel):
         layout.prop(EmetTool, "output_directory")
         layout.label(text="Selected Render Type")
         layout.prop(EmetTool, "selected_render")
+        layout.label(text="Frame Capture")
+        layout.prop(EmetTool, "capture_mode")
+        layout.prop(EmetTool, "render_workers")
+        layout.prop(EmetTool, "use_auto_border")
+        layout.prop(EmetTool, "use_camera_orbit")
+        layout.prop(EmetTool, "resume_render")
+        layout.prop(EmetTool, "use_character_batch")
+        layout.prop(EmetTool, "use_view_layer_visibility")
+        layout.prop(EmetTool, "use_frame_dedup")
+        layout.prop(EmetTool, "use_tight_packing")
+        layout.prop(EmetTool, "strip_memory_budget_mb")
+        layout.prop(EmetTool, "use_single_pass_stages")
+        layout.prop(EmetTool, "use_render_cache")
+        if EmetTool.use_render_cache:
+            layout.label(text="Render Cache Directory")
+            layout.prop(EmetTool, "render_cache_directory")
+            layout.prop(EmetTool, "render_cache_size_mb")
         layout.label(text="Collection containing cameras to use for render")
         layout.prop(context.scene,"CameraCollectionPointer" , text="")
+        if context.scene.CameraCollectionPointer != None:
+            layout.prop(EmetTool, "use_multiview_cameras")
 
-        layout.operator(EMET_OT_render_tiles_operator.bl_idname, text="Render", icon="SCENE")
+        if render_progress["running"]:
+            layout.label(text=f"Rendered {render_progress['done']}/{render_progress['total']}, ETA {format_eta()}")
+            layout.operator(EMET_OT_cancel_render_operator.bl_idname, text="Cancel", icon="CANCEL")
+        else:
+            layout.operator(EMET_OT_render_tiles_operator.bl_idname, text="Render", icon="SCENE")
+            layout.operator(EMET_OT_render_tiles_modal_operator.bl_idname, text="Render in background", icon="RENDER_ANIMATION")
 
 
 classes = [
-    EMET_properties, EMET_OT_render_tiles_operator, EMET_PT_tiles,
+    EMET_properties, EMET_OT_render_tiles_operator, EMET_OT_render_tiles_modal_operator,
+    EMET_OT_cancel_render_operator, EMET_PT_tiles,
 ]
 
 
@@ -0,0 +1,82 @@
+import struct
+import zlib
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Streaming PNG writer
+# ------------------------------------------------------------------------
+#
+# cv2.imwrite needs the whole sheet in memory. This writer takes sheet in bands of rows,
+# filters and compresses them as they come, so only one band is in memory at any time.
+# Bands use cv2 channel order (BGR, BGRA) like the rest of the pipeline.
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Color type by channel count
+PNG_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+IDAT_CHUNK_BYTES = 1 << 20
+BAND_BYTES = 64 << 20
+
+
+def _write_chunk(file, chunk_type, data):
+    file.write(struct.pack(">I", len(data)))
+    file.write(chunk_type)
+    file.write(data)
+    file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+
+def _band_bytes(band):
+    # Rows as PNG stores them: RGB(A) order, 16 bit samples big endian
+    if band.shape[2] >= 3:
+        band = band[:, :, [2, 1, 0] + list(range(3, band.shape[2]))]
+    if band.dtype == np.uint16:
+        band = band.astype(">u2")
+    return np.ascontiguousarray(band).view(np.uint8).reshape(band.shape[0], -1)
+
+
+def band_height(width, depth, dtype, max_bytes=BAND_BYTES):
+    return max(1, max_bytes // max(1, width * depth * np.dtype(dtype).itemsize))
+
+
+def write_png(path, width, height, depth, dtype, bands, compression=6):
+    """
+    Writes PNG from iterable of bands, arrays of (rows, width, depth) that together have height rows.
+    Every row uses Up filter, which costs one vectorised subtraction and suits large flat areas of sheets.
+    """
+    if depth not in PNG_COLOR_TYPES.keys() or np.dtype(dtype) not in (np.dtype(np.uint8), np.dtype(np.uint16)):
+        raise ValueError(f"Can't write {depth} channel {np.dtype(dtype)} image as PNG")
+    bit_depth = 8 * np.dtype(dtype).itemsize
+    compressor = zlib.compressobj(compression)
+    previous_row = np.zeros(width * depth * np.dtype(dtype).itemsize, np.uint8)
+    written_rows = 0
+    with open(path, "wb") as file:
+        file.write(PNG_SIGNATURE)
+        _write_chunk(file, b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, PNG_COLOR_TYPES[depth], 0, 0, 0))
+        pending = []
+        pending_size = 0
+        for band in bands:
+            rows = _band_bytes(np.asarray(band))
+            filtered = np.empty((rows.shape[0], rows.shape[1] + 1), np.uint8)
+            filtered[:, 0] = 2
+            filtered[0, 1:] = rows[0] - previous_row
+            filtered[1:, 1:] = rows[1:] - rows[:-1]
+            previous_row = rows[-1].copy()
+            written_rows += rows.shape[0]
+            data = compressor.compress(filtered.tobytes())
+            pending.append(data)
+            pending_size += len(data)
+            if pending_size >= IDAT_CHUNK_BYTES:
+                _write_chunk(file, b"IDAT", b"".join(pending))
+                pending = []
+                pending_size = 0
+        pending.append(compressor.flush())
+        _write_chunk(file, b"IDAT", b"".join(pending))
+        _write_chunk(file, b"IEND", b"")
+    if written_rows != height:
+        raise ValueError(f"PNG {path} got {written_rows} rows, expected {height}")
+
+
+def write_layout_png(path, layout, strips):
+    # Sheet of layout written band by band, it is never whole in memory
+    rows_per_band = band_height(layout.width, layout.depth, layout.dtype)
+    bands = (layout.compose_rows(strips, top, min(top + rows_per_band, layout.height)) for top in range(0, layout.height, rows_per_band))
+    write_png(path, layout.width, layout.height, layout.depth, layout.dtype, bands)
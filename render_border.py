@@ -0,0 +1,95 @@
+import bpy
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Automatic render border
+# ------------------------------------------------------------------------
+
+# Extra pixels around projected bounding boxes, covers interpolation overshoot of stretched actions
+BORDER_MARGIN_PX = 2
+# Objects without geometry don't need to be inside border
+NON_RENDERABLE_TYPES = ['ARMATURE', 'EMPTY', 'CAMERA', 'LIGHT', 'LIGHT_PROBE', 'SPEAKER']
+
+
+def renderable_objects(obj):
+    # Armature itself is never rendered, its children are
+    objects = [obj] + list(obj.children_recursive)
+    return [x for x in objects if x.type not in NON_RENDERABLE_TYPES]
+
+
+def collect_world_corners(scene, objects, frames):
+    # Bounding box corners of evaluated (deformed) objects in world space, for every frame
+    corners = []
+    for frame in frames:
+        scene.frame_set(frame)
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        for obj in objects:
+            evaluated = obj.evaluated_get(depsgraph)
+            matrix = np.array(evaluated.matrix_world)
+            local = np.array([tuple(x) for x in evaluated.bound_box])
+            corners.append(local @ matrix[:3, :3].T + matrix[:3, 3])
+    if len(corners) == 0:
+        return np.zeros((0, 3))
+    return np.concatenate(corners)
+
+
+def camera_matrix(camera):
+    # matrix_world is only updated by depsgraph, camera is moved right before we need it
+    matrix = camera.matrix_basis.copy()
+    if camera.parent != None:
+        matrix = camera.parent.matrix_world @ camera.matrix_parent_inverse @ matrix
+    return matrix
+
+
+def compute_border(scene, camera, world_corners):
+    """
+    Returns (min_x, max_x, min_y, max_y) of render border enclosing all points,
+    or None when whole frame has to be rendered.
+    Same projection as bpy_extras.object_utils.world_to_camera_view, for all points at once.
+    """
+    if len(world_corners) == 0:
+        return None
+    matrix = np.array(camera_matrix(camera).normalized().inverted())
+    local = world_corners @ matrix[:3, :3].T + matrix[:3, 3]
+    frame = [v for v in camera.data.view_frame(scene=scene)[:3]]
+    x = local[:, 0]
+    y = local[:, 1]
+    if camera.data.type != 'ORTHO':
+        depth = -local[:, 2]
+        if np.any(depth <= camera.data.clip_start):
+            # Something is behind or at the camera, projection is meaningless
+            return None
+        frame_depth = -frame[0].z
+        x = x / depth * frame_depth
+        y = y / depth * frame_depth
+    min_x, max_x = frame[2].x, frame[1].x
+    min_y, max_y = frame[1].y, frame[0].y
+    u = (x - min_x) / (max_x - min_x)
+    v = (y - min_y) / (max_y - min_y)
+
+    resolution_x = scene.render.resolution_x * scene.render.resolution_percentage / 100
+    resolution_y = scene.render.resolution_y * scene.render.resolution_percentage / 100
+    margin_x = BORDER_MARGIN_PX / resolution_x
+    margin_y = BORDER_MARGIN_PX / resolution_y
+    border = (
+        max(0.0, float(u.min()) - margin_x),
+        min(1.0, float(u.max()) + margin_x),
+        max(0.0, float(v.min()) - margin_y),
+        min(1.0, float(v.max()) + margin_y),
+    )
+    if border[1] <= border[0] or border[3] <= border[2]:
+        # Nothing in view
+        return None
+    return border
+
+
+def border_region(scene, width, height):
+    # Pixel region of the border, (x, y from top, width, height), same truncation as Blender uses
+    render = scene.render
+    if not render.use_border:
+        return None
+    x_min = int(render.border_min_x * width)
+    x_max = int(render.border_max_x * width)
+    y_min = int(render.border_min_y * height)
+    y_max = int(render.border_max_y * height)
+    return (x_min, height - y_max, x_max - x_min, y_max - y_min)
@@ -0,0 +1,282 @@
+import bpy
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Content addressed render cache
+# ------------------------------------------------------------------------
+
+# Bump when anything changes in the way strips are rendered or hashed
+CACHE_VERSION = 1
+
+# Node attributes that change node output, checked with getattr since every node type has different set
+NODE_SETTINGS = ["boolean", "integer", "value", "string", "vector", "operation", "blend_type", "data_type",
+                 "domain", "mode", "interpolation", "interpolation_type", "use_clamp"]
+# Properties which don't change rendered image, changing them should not invalidate cache
+IGNORED_PROPERTIES = ["rna_type", "filepath", "name", "name_full", "select", "is_evaluated", "original",
+                      "session_uid", "users", "use_fake_user", "is_missing", "is_runtime_data", "tag"]
+
+
+def _value_to_bytes(value):
+    if isinstance(value, (set, frozenset)):
+        # Enum flags, set iteration order is not stable between Blender sessions
+        value = tuple(sorted(value))
+    elif hasattr(value, "name_full"):
+        # Pointer to ID like material or object
+        value = value.name_full
+    elif hasattr(value, "__len__") and not isinstance(value, str):
+        value = tuple(_rounded(x) for x in value)
+    else:
+        value = _rounded(value)
+    return repr(value).encode()
+
+
+def _rounded(value):
+    # Floats are rounded so tiny drift of repeated camera rotation doesn't cause misses
+    if isinstance(value, float):
+        return round(value, 5)
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(_rounded(x) for x in value)
+    return value
+
+
+def _update(hasher, *values):
+    for value in values:
+        hasher.update(_value_to_bytes(value))
+        hasher.update(b"|")
+
+
+def _hash_rna_properties(hasher, struct):
+    # Every simple property of struct, pointers and collections are left for caller to handle
+    if struct == None:
+        _update(hasher, None)
+        return
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in IGNORED_PROPERTIES or prop.type in ('POINTER', 'COLLECTION'):
+            continue
+        _update(hasher, prop.identifier, getattr(struct, prop.identifier, None))
+
+
+def _hash_matrix(hasher, matrix):
+    _update(hasher, [tuple(row) for row in matrix])
+
+
+def _hash_transform(hasher, obj):
+    # matrix_world is not updated until depsgraph evaluation, and we hash right after moving
+    # camera or scaling props, so local transform and parenting are hashed instead
+    _hash_matrix(hasher, obj.matrix_basis)
+    _update(hasher, obj.delta_location, obj.delta_rotation_euler, obj.delta_scale)
+    if obj.parent != None:
+        _update(hasher, obj.parent.name_full, obj.parent_type, obj.parent_bone)
+        _hash_matrix(hasher, obj.matrix_parent_inverse)
+
+
+def _hash_layer_collection(hasher, layer_collection):
+    _update(hasher, layer_collection.collection.name_full, layer_collection.exclude, layer_collection.holdout, layer_collection.indirect_only)
+    for child in layer_collection.children:
+        _hash_layer_collection(hasher, child)
+
+
+def _hash_node_tree(hasher, node_tree):
+    if node_tree == None:
+        _update(hasher, None)
+        return
+    _update(hasher, node_tree.name_full)
+    for node in node_tree.nodes:
+        _update(hasher, node.bl_idname, node.name, node.label, node.mute)
+        for setting in NODE_SETTINGS:
+            if hasattr(node, setting):
+                _update(hasher, setting, getattr(node, setting))
+        for socket in node.inputs:
+            if hasattr(socket, "default_value") and not socket.is_linked:
+                _update(hasher, socket.identifier, socket.default_value)
+        if getattr(node, "image", None) != None:
+            _update(hasher, node.image.name_full, node.image.filepath)
+        if getattr(node, "node_tree", None) != None:
+            # Group node
+            _hash_node_tree(hasher, node.node_tree)
+    for link in node_tree.links:
+        _update(hasher, link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier, link.is_muted)
+
+
+class SceneStateHasher:
+    """
+    Hashes everything that affects a rendered strip. Meshes, materials and actions don't change
+    during one render job so their digests are computed once, everything else is hashed per render.
+    """
+
+    def __init__(self):
+        self.digests = {}
+
+    def _memoized(self, kind, datablock, hash_function):
+        key = (kind, datablock.name_full)
+        if key not in self.digests.keys():
+            hasher = hashlib.sha256()
+            hash_function(hasher, datablock)
+            self.digests[key] = hasher.digest()
+        return self.digests[key]
+
+    def _hash_action(self, hasher, action):
+        _update(hasher, action.frame_start, action.frame_end)
+        for fcurve in action.fcurves:
+            _update(hasher, fcurve.data_path, fcurve.array_index, fcurve.extrapolation, fcurve.mute)
+            points = len(fcurve.keyframe_points)
+            for attribute in ("co", "handle_left", "handle_right"):
+                values = np.empty(points * 2, np.float32)
+                fcurve.keyframe_points.foreach_get(attribute, values)
+                hasher.update(values.tobytes())
+            _update(hasher, [x.interpolation for x in fcurve.keyframe_points])
+
+    def _hash_mesh(self, hasher, mesh):
+        coordinates = np.empty(len(mesh.vertices) * 3, np.float32)
+        mesh.vertices.foreach_get("co", coordinates)
+        hasher.update(coordinates.tobytes())
+        vertex_indices = np.empty(len(mesh.loops), np.int32)
+        mesh.loops.foreach_get("vertex_index", vertex_indices)
+        hasher.update(vertex_indices.tobytes())
+        material_indices = np.empty(len(mesh.polygons), np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+        hasher.update(material_indices.tobytes())
+
+    def _hash_material(self, hasher, material):
+        _hash_rna_properties(hasher, material)
+        _hash_node_tree(hasher, material.node_tree)
+
+    def _hash_object(self, hasher, obj):
+        _update(hasher, obj.name_full, obj.type, obj.is_holdout, obj.hide_render)
+        _hash_transform(hasher, obj)
+        if obj.animation_data != None and obj.animation_data.action != None:
+            hasher.update(self._memoized("action", obj.animation_data.action, self._hash_action))
+        for modifier in obj.modifiers:
+            _hash_rna_properties(hasher, modifier)
+            if modifier.type == 'NODES':
+                # Geometry node toggles live here, never memoized
+                _hash_node_tree(hasher, modifier.node_group)
+        if obj.type == 'MESH':
+            hasher.update(self._memoized("mesh", obj.data, self._hash_mesh))
+        elif obj.data != None:
+            _hash_rna_properties(hasher, obj.data)
+        for slot in obj.material_slots:
+            if slot.material != None:
+                hasher.update(self._memoized("material", slot.material, self._hash_material))
+
+    def key(self, scene, camera, extra=()):
+        hasher = hashlib.sha256()
+        _update(hasher, CACHE_VERSION, *extra)
+
+        # Render settings and resolution
+        _update(hasher, scene.frame_start, scene.frame_end, scene.frame_step)
+        _hash_rna_properties(hasher, scene.render)
+        _hash_rna_properties(hasher, scene.render.image_settings)
+        _hash_rna_properties(hasher, scene.view_settings)
+        _hash_rna_properties(hasher, scene.display_settings)
+        for engine_settings in ("cycles", "eevee"):
+            if hasattr(scene, engine_settings):
+                _hash_rna_properties(hasher, getattr(scene, engine_settings))
+        if scene.world != None:
+            _hash_node_tree(hasher, scene.world.node_tree)
+
+        # Camera
+        _hash_transform(hasher, camera)
+        _hash_rna_properties(hasher, camera.data)
+
+        # Everything that can end up in the render
+        for collection in bpy.data.collections:
+            _update(hasher, collection.name_full, collection.hide_render)
+        for obj in scene.objects:
+            if obj.hide_render:
+                continue
+            self._hash_object(hasher, obj)
+        # Objects can also be shown, hidden or made holdout by rendered view layers
+        for layer in scene.view_layers:
+            if layer.use:
+                _hash_layer_collection(hasher, layer.layer_collection)
+
+        # Toggles also live in nested node groups that modifiers don't point to directly
+        for node_group in bpy.data.node_groups:
+            for node in node_group.nodes:
+                if hasattr(node, "boolean"):
+                    _update(hasher, node_group.name_full, node.name, node.label, node.boolean)
+        return hasher.hexdigest()
+
+
+class RenderCache:
+    """
+    Persistent directory of strips named by their scene state hash.
+    Least recently used strips are removed once cache gets bigger than max_bytes.
+    Safe to use from render and post processing threads at the same time.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.lock = threading.Lock()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        # Path to (last use time, size)
+        self.entries = {}
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, file_name)
+            stat = os.stat(path)
+            self.entries[path] = (stat.st_mtime, stat.st_size)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+
+    def put(self, key, strip):
+        with self.lock:
+            self._put(key, strip)
+
+    def _get(self, key):
+        path = self._path(key)
+        if path not in self.entries.keys():
+            self.misses += 1
+            return None
+        try:
+            strip = np.load(path)
+            # Mark as recently used
+            os.utime(path)
+            self.entries[path] = (os.stat(path).st_mtime, self.entries[path][1])
+        except (OSError, ValueError):
+            # Broken entry or removed by another Blender sharing the cache
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return strip
+
+    def _put(self, key, strip):
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as fp:
+            np.save(fp, np.ascontiguousarray(strip))
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self.entries[path] = (stat.st_mtime, stat.st_size)
+        self.evict()
+
+    def evict(self):
+        total = sum(x[1] for x in self.entries.values())
+        for path in sorted(self.entries.keys(), key=lambda x: self.entries[x][0]):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries[path][1]
+            self._remove(path)
+
+    def _remove(self, path):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.entries.pop(path, None)
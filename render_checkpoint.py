@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Resumable render jobs
+# ------------------------------------------------------------------------
+
+CHECKPOINT_DIRECTORY = "checkpoint"
+MANIFEST_FILENAME = "checkpoint.json"
+# Finished strips are appended one line each, so saving a strip doesn't rewrite whole manifest
+JOURNAL_FILENAME = "units.jsonl"
+
+
+def unit_key(*parts):
+    # (camera, strip store, file, action, row) joined into one manifest key
+    return "|".join(str(x) for x in parts)
+
+
+def _read_manifest(job_directory):
+    manifest_path = os.path.join(job_directory, CHECKPOINT_DIRECTORY, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        # Crash while writing manifest, os.replace makes this unlikely but not impossible on every filesystem
+        return None
+
+
+def _read_journal(directory):
+    units = {}
+    journal_path = os.path.join(directory, JOURNAL_FILENAME)
+    if not os.path.exists(journal_path):
+        return units
+    with open(journal_path, 'r') as fp:
+        for line in fp:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Line being appended when job died, its strip is rendered again
+                continue
+            units[entry["key"]] = entry["file"]
+    return units
+
+
+def find_resumable_job(output_directory, directory_prefix, signature):
+    """
+    Newest temp directory of an unfinished job with the same signature, or None.
+    Temp directories are named by timestamp so name order is age order.
+    """
+    if not os.path.isdir(output_directory):
+        return None
+    candidates = sorted([x for x in os.listdir(output_directory) if x.startswith(directory_prefix)], reverse=True)
+    for candidate in candidates:
+        job_directory = os.path.join(output_directory, candidate)
+        manifest = _read_manifest(job_directory)
+        if manifest == None or manifest["complete"] or manifest["signature"] != signature:
+            continue
+        return job_directory
+    return None
+
+
+class JobCheckpoint:
+    """
+    Every finished strip row is saved to the job temp directory as .npy and appended to a journal,
+    so job interrupted by crash can be resumed without rendering finished rows again.
+    Manifest holds only job signature and is written once. Checkpoint data is deleted when job completes.
+    Safe to use from render and post processing threads at the same time.
+    """
+
+    def __init__(self, job_directory, signature):
+        self.lock = threading.Lock()
+        self.directory = os.path.join(job_directory, CHECKPOINT_DIRECTORY)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_FILENAME)
+        self.journal_path = os.path.join(self.directory, JOURNAL_FILENAME)
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest = _read_manifest(job_directory)
+        self.units = {}
+        if self.manifest == None or self.manifest["signature"] != signature:
+            self.manifest = {"signature": signature, "complete": False}
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._write_manifest()
+        else:
+            self.units = _read_journal(self.directory)
+            # Rewritten once so a line cut off by the crash doesn't swallow the next appended one
+            with open(self.journal_path, 'w') as fp:
+                fp.writelines(json.dumps({"key": key, "file": file_name}) + "\n" for key, file_name in self.units.items())
+        self.resumed_units = 0
+
+    def has(self, key):
+        with self.lock:
+            return key in self.units.keys()
+
+    def load(self, key):
+        with self.lock:
+            path = os.path.join(self.directory, self.units[key])
+            try:
+                strip = np.load(path)
+            except (OSError, ValueError):
+                # Strip was being written when job died, it has to be rendered again
+                self.units.pop(key)
+                return None
+            self.resumed_units += 1
+            return strip
+
+    def save(self, key, strip):
+        with self.lock:
+            file_name = f"unit_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy"
+            path = os.path.join(self.directory, file_name)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as fp:
+                np.save(fp, np.ascontiguousarray(strip))
+            os.replace(tmp_path, path)
+            self.units[key] = file_name
+            # Strip file is complete before its journal line exists
+            with open(self.journal_path, 'a') as fp:
+                fp.write(json.dumps({"key": key, "file": file_name}) + "\n")
+
+    def mark_complete(self):
+        # Finished job is never resumed, its strips are already in the sheets
+        with self.lock:
+            self.manifest["complete"] = True
+            self._write_manifest()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _write_manifest(self):
+        # Manifest is replaced atomically, it always lists only strips that were fully written
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as fp:
+            json.dump(self.manifest, fp, indent=4)
+        os.replace(tmp_path, self.manifest_path)
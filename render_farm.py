@@ -0,0 +1,203 @@
+import bpy
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Multi process render farm
+# ------------------------------------------------------------------------
+#
+# Coordinator (interactive Blender) saves copy of current .blend, splits animation render
+# into work units (camera, action row) and runs them on N `blender --background` workers.
+# Every worker runs the same render operator restricted to its units and saves strips as .npy
+# with a manifest, coordinator merges them and assembles sheets and json as usual.
+
+JOB_FILENAME = "job.json"
+MANIFEST_FILENAME = "manifest.json"
+
+
+class WorkUnit:
+    def __init__(self, camera_index, action_rows, cost, character_index=None):
+        self.camera_index = camera_index
+        # Indices into actions rows of the character
+        self.action_rows = action_rows
+        # Estimated number of rendered frames, used only for balancing
+        self.cost = cost
+        # Index into enabled character batch rows, None renders character of Actions Mixer panel
+        self.character_index = character_index
+
+    def to_dict(self):
+        unit = {"camera_index": self.camera_index, "action_rows": self.action_rows}
+        if self.character_index != None:
+            unit["character_index"] = self.character_index
+        return unit
+
+
+def estimate_action_cost(actions_mixer_row, rotations, pass_count, wearable_count, triple_attack_frames):
+    action = bpy.data.actions.get(actions_mixer_row.character_action_name)
+    if action == None:
+        return 0
+    frames = int(action.frame_end)
+    cost = frames * rotations * (pass_count + wearable_count)
+    if actions_mixer_row.prop_for_action_name != 'None':
+        # Prop on its own
+        cost += frames * rotations
+        if actions_mixer_row.is_attack_render:
+            cost += frames * rotations * (3 if triple_attack_frames else 1)
+    return cost
+
+
+def plan_units(scene, camera_count, characters, use_character_batch):
+    rotations = scene.EmetTool.rotations
+    pass_count = 2 if scene.EmetTool.enable_bg_fg_render else 1
+    units = []
+    for character_index, character in enumerate(characters):
+        wearable_count = 0
+        if character.wearable_collection != None:
+            wearable_count = len(character.wearable_collection.objects)
+        for camera_index in range(camera_count):
+            for row_index, actions_mixer_row in enumerate(character.actions):
+                cost = estimate_action_cost(actions_mixer_row, rotations, pass_count, wearable_count, scene.TripleAttackAnimationFrames)
+                units.append(WorkUnit(camera_index, [row_index], cost, character_index if use_character_batch else None))
+    return units
+
+
+def assign_units(units, worker_count):
+    # Longest unit first to the least loaded worker, good enough balancing for our job sizes
+    workers = [[] for _ in range(worker_count)]
+    loads = [0] * worker_count
+    for unit in sorted(units, key=lambda x: x.cost, reverse=True):
+        least_loaded = loads.index(min(loads))
+        workers[least_loaded].append(unit)
+        loads[least_loaded] += unit.cost
+    return [x for x in workers if len(x) > 0]
+
+
+def _worker_command(blend_path, job_path, threads):
+    # Addon is enabled from user preferences in background Blender as well
+    expr = f"import importlib; importlib.import_module('{__package__}.render_farm').worker_main()"
+    return [
+        bpy.app.binary_path,
+        "--background", blend_path,
+        "--threads", str(threads),
+        "--python-expr", expr,
+        "--", "--job", job_path,
+    ]
+
+
+def run_farm(scene, farm_directory, camera_count, worker_count, characters, use_character_batch=False):
+    """
+    Renders all units on worker_count background Blender processes and blocks until they finish.
+    characters are CharacterSetup of the job. Returns list of unit output directories.
+    """
+    os.makedirs(farm_directory, exist_ok=True)
+    blend_path = os.path.join(farm_directory, "farm_scene.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True, check_existing=False)
+
+    worker_jobs = assign_units(plan_units(scene, camera_count, characters, use_character_batch), worker_count)
+    threads = max(1, (os.cpu_count() or 1) // max(1, len(worker_jobs)))
+
+    processes = []
+    unit_directories = []
+    for worker_index, worker_units in enumerate(worker_jobs):
+        worker_directory = os.path.join(farm_directory, f"worker_{worker_index}")
+        os.makedirs(worker_directory, exist_ok=True)
+        job = {"units": []}
+        for unit_index, unit in enumerate(worker_units):
+            unit_dict = unit.to_dict()
+            unit_dict["output_directory"] = os.path.join(worker_directory, f"unit_{unit_index}")
+            unit_directories.append(unit_dict["output_directory"])
+            job["units"].append(unit_dict)
+        job_path = os.path.join(worker_directory, JOB_FILENAME)
+        with open(job_path, 'w') as fp:
+            json.dump(job, fp, indent=4)
+
+        log = open(os.path.join(worker_directory, "worker.log"), 'w')
+        process = subprocess.Popen(_worker_command(blend_path, job_path, threads), stdout=log, stderr=subprocess.STDOUT)
+        processes.append((process, log, worker_directory))
+
+    failed = []
+    for process, log, worker_directory in processes:
+        process.wait()
+        log.close()
+        if process.returncode != 0:
+            failed.append(worker_directory)
+    if len(failed) > 0:
+        raise RuntimeError(f"Render farm workers failed, see worker.log in: {', '.join(failed)}")
+    return unit_directories
+
+
+def save_unit_strips(output_directory, render_dict, affix_filename, has_fg_bg):
+    # Called by worker instead of assembling sheets
+    os.makedirs(output_directory, exist_ok=True)
+    manifest_path = os.path.join(output_directory, MANIFEST_FILENAME)
+    manifest = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as fp:
+            manifest = json.load(fp)
+    for file_name in render_dict.keys():
+        for action_name in render_dict[file_name].keys():
+            strip_path = os.path.join(output_directory, f"strip_{len(manifest)}.npy")
+            np.save(strip_path, render_dict[file_name][action_name])
+            manifest.append({
+                "file_name": file_name,
+                "action_name": action_name,
+                "affix_filename": affix_filename,
+                "has_fg_bg": has_fg_bg,
+                "path": strip_path,
+            })
+    with open(manifest_path, 'w') as fp:
+        json.dump(manifest, fp, indent=4)
+
+
+def collect_unit_strips(unit_directories, action_order):
+    """
+    Merges strips of all units into render dictionaries, one per (affix_filename, has_fg_bg).
+    Actions inside every file are ordered like in action_order, so sheet layout matches single process render.
+    """
+    groups = {}
+    for unit_directory in unit_directories:
+        manifest_path = os.path.join(unit_directory, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            # Unit had nothing to render, for example only None actions
+            continue
+        with open(manifest_path, 'r') as fp:
+            manifest = json.load(fp)
+        for entry in manifest:
+            group_key = (entry["affix_filename"], entry["has_fg_bg"])
+            if group_key not in groups.keys():
+                groups[group_key] = {}
+            if entry["file_name"] not in groups[group_key].keys():
+                groups[group_key][entry["file_name"]] = {}
+            groups[group_key][entry["file_name"]][entry["action_name"]] = np.load(entry["path"])
+
+    def action_position(action_name):
+        if action_name in action_order:
+            return action_order.index(action_name)
+        return len(action_order)
+
+    for render_dict in groups.values():
+        for file_name in render_dict.keys():
+            actions = render_dict[file_name]
+            render_dict[file_name] = {x: actions[x] for x in sorted(actions.keys(), key=action_position)}
+    return groups
+
+
+def worker_main():
+    argv = sys.argv[sys.argv.index("--") + 1:]
+    job_path = argv[argv.index("--job") + 1]
+    with open(job_path, 'r') as fp:
+        job = json.load(fp)
+
+    exit_code = 0
+    for unit in job["units"]:
+        bpy.ops.emet.render_tiles_operator(farm_unit_json=json.dumps(unit))
+        # Operator reports errors instead of raising, successful unit always leaves a marker
+        if not os.path.exists(os.path.join(unit["output_directory"], "done")):
+            print(f"Render farm unit failed: {unit}")
+            exit_code = 1
+            break
+    sys.exit(exit_code)
@@ -0,0 +1,84 @@
+# ------------------------------------------------------------------------
+#   Render unit scheduling
+# ------------------------------------------------------------------------
+#
+# Every strip kind of every action and render type is a render unit with the scene state it needs.
+# Changing state between renders is what costs: node toggles re-evaluate geometry of the whole scene,
+# visibility and holdout change what ends up in the render (and its BVH), action change re-evaluates animation.
+# Camera moves between rotations of a unit are cheap and not counted.
+
+TRANSITION_COSTS = {"toggles": 8, "visible": 4, "holdout": 4, "action": 2}
+
+
+class UnitState:
+    def __init__(self, toggles, visible, holdout, action):
+        # Tuple of (node toggle label, value)
+        self.toggles = toggles
+        # (kind, object name) of prop or wearable rendered next to character, or None
+        self.visible = visible
+        # Whether character is holdout
+        self.holdout = holdout
+        # Action played by character and visible object
+        self.action = action
+
+    def changes(self, other):
+        # Parts of the state that differ from other state, everything when there is no other state
+        if other == None:
+            return list(TRANSITION_COSTS.keys())
+        return [x for x in TRANSITION_COSTS.keys() if getattr(self, x) != getattr(other, x)]
+
+
+class RenderUnit:
+    def __init__(self, state, strip_store, file_name, action_name, pass_index, actions_mixer_row, is_physics=False, depends_on=None):
+        self.state = state
+        self.strip_store = strip_store
+        self.file_name = file_name
+        self.action_name = action_name
+        # Rows of the unit are pass_index * rotations + rotation
+        self.pass_index = pass_index
+        self.actions_mixer_row = actions_mixer_row
+        # Physics unit reuses frames of the prop unit it depends on
+        self.is_physics = is_physics
+        # Index of unit that has to be rendered before this one
+        self.depends_on = depends_on
+
+
+def transition_cost(previous, state):
+    return sum(TRANSITION_COSTS[x] for x in state.changes(previous))
+
+
+def count_transitions(units, initial_state=None):
+    # Number of state parts changed when units are rendered in given order
+    count = 0
+    state = initial_state
+    for unit in units:
+        count += len(unit.state.changes(state))
+        state = unit.state
+    return count
+
+
+def plan_units(units, initial_state=None):
+    """
+    Orders units so consecutive units share as much state as possible. Greedy, always continues
+    with the cheapest unit whose dependency was already rendered, ties keep listing order.
+    """
+    remaining = list(range(len(units)))
+    done = set()
+    order = []
+    state = initial_state
+    while len(remaining) > 0:
+        best = None
+        best_cost = None
+        for index in remaining:
+            depends_on = units[index].depends_on
+            if depends_on != None and depends_on not in done:
+                continue
+            cost = transition_cost(state, units[index].state)
+            if best == None or cost < best_cost:
+                best = index
+                best_cost = cost
+        order.append(units[best])
+        done.add(best)
+        remaining.remove(best)
+        state = units[best].state
+    return order
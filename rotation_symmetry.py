@@ -0,0 +1,35 @@
+# ------------------------------------------------------------------------
+#   Mirror symmetry of camera orbit
+# ------------------------------------------------------------------------
+
+# Character left and right side lie on X axis (it faces -Y or +Y), mirrored by x -> -x
+MIRROR_X = 'X'
+# Character left and right side lie on Y axis (it faces -X or +X), mirrored by y -> -y
+MIRROR_Y = 'Y'
+MIRROR_NONE = 'NONE'
+
+
+def mirror_source_rotations(rotations, mirror_axis):
+    """
+    For every rotation returns index of the rotation it is horizontal mirror of,
+    or None when it has to be rendered. Rotation r is camera orbiting around Z
+    at angle (r + 1) * 2pi / rotations, counted from +X axis, looking at the origin.
+    """
+    sources = [None] * rotations
+    if mirror_axis == MIRROR_NONE:
+        return sources
+    if mirror_axis == MIRROR_X and rotations % 2 != 0:
+        # Mirror of angle a is pi - a, which is not on the orbit for odd rotation count
+        return sources
+
+    for rotation in range(rotations):
+        step = rotation + 1
+        if mirror_axis == MIRROR_X:
+            mirrored_step = (rotations // 2 - step) % rotations
+        else:
+            mirrored_step = (-step) % rotations
+        mirrored_rotation = (mirrored_step - 1) % rotations
+        # Lower index is rendered, rotations lying on the mirror plane map to themselves
+        if mirrored_rotation < rotation:
+            sources[rotation] = mirrored_rotation
+    return sources
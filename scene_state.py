@@ -0,0 +1,76 @@
+import bpy
+
+# ------------------------------------------------------------------------
+#   Scoped scene state snapshot
+# ------------------------------------------------------------------------
+#
+# Render job changes only a handful of properties: camera transforms, scales, render visibility,
+# holdouts, assigned actions, node booleans, frame range and output path. Recording just those
+# is a lot cheaper than a global undo push of the whole file and restore() puts them back after
+# success, error and cancel alike.
+
+
+class SceneStateRecorder:
+    def __init__(self, scene, cameras):
+        self.scene = scene
+        self.scene_camera = scene.camera
+        self.frame_range = (scene.frame_start, scene.frame_end, scene.frame_step, scene.frame_current)
+        self.render_filepath = scene.render.filepath
+        self.camera_transforms = [(x, x.location.copy(), x.rotation_euler.copy()) for x in cameras]
+        self.objects = []
+        for obj in scene.objects:
+            action = None
+            action_slot = None
+            if obj.animation_data != None:
+                action = obj.animation_data.action
+                action_slot = getattr(obj.animation_data, "action_slot", None)
+            self.objects.append((obj, obj.scale.copy(), obj.hide_render, obj.is_holdout, obj.animation_data != None, action, action_slot))
+        self.collections = [(x, x.hide_render) for x in bpy.data.collections]
+        self.nodes = []
+        for node_group in bpy.data.node_groups:
+            for node in node_group.nodes:
+                self.nodes.append((node, node.mute, node.boolean if hasattr(node, "boolean") else None))
+
+    def restore(self):
+        # Only values that differ are written, every write makes Blender re-evaluate what depends on it.
+        # Datablocks removed while rendering raise ReferenceError and are skipped
+        for node, mute, boolean in self.nodes:
+            try:
+                if node.mute != mute:
+                    node.mute = mute
+                if boolean != None and node.boolean != boolean:
+                    node.boolean = boolean
+            except ReferenceError:
+                pass
+        for collection, hide_render in self.collections:
+            try:
+                if collection.hide_render != hide_render:
+                    collection.hide_render = hide_render
+            except ReferenceError:
+                pass
+        for obj, scale, hide_render, is_holdout, had_animation_data, action, action_slot in self.objects:
+            try:
+                if obj.scale != scale:
+                    obj.scale = scale
+                if obj.hide_render != hide_render:
+                    obj.hide_render = hide_render
+                if obj.is_holdout != is_holdout:
+                    obj.is_holdout = is_holdout
+                if obj.animation_data != None and obj.animation_data.action != action:
+                    obj.animation_data.action = action
+                    if action_slot != None:
+                        obj.animation_data.action_slot = action_slot
+                elif obj.animation_data == None and had_animation_data:
+                    obj.animation_data_create().action = action
+            except ReferenceError:
+                pass
+        for camera, location, rotation in self.camera_transforms:
+            try:
+                camera.location = location
+                camera.rotation_euler = rotation
+            except ReferenceError:
+                pass
+        self.scene.camera = self.scene_camera
+        self.scene.frame_start, self.scene.frame_end, self.scene.frame_step, frame_current = self.frame_range
+        self.scene.frame_set(frame_current)
+        self.scene.render.filepath = self.render_filepath
@@ -0,0 +1,129 @@
+import json
+import os
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .atlas_layout import AtlasLayout
+from .frame_dedup import DedupLayout
+from .atlas_packing import PackedLayout
+from .png_stream import write_layout_png
+
+# ------------------------------------------------------------------------
+#   Frame decoding and sheet export
+# ------------------------------------------------------------------------
+#
+# Post processing half of the pipeline, it needs only NumPy and cv2 so it runs on worker threads
+# and in benchmarks/ without Blender.
+
+# Frames are decoded in parallel, cv2 releases GIL while decoding
+MAX_DECODE_THREADS = 8
+
+def read_frame(filepath):
+    image = cv2.imread(filepath, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise RuntimeError(f"Could not read rendered frame: {filepath}")
+    return image
+
+def combine_frames(filepaths):
+    # Decode frames from filepaths (in order) into one horizontal strip.
+    # Strip is allocated once from first frame size and every frame is decoded straight into its place
+    if len(filepaths) == 0:
+        return []
+    first_frame = read_frame(filepaths[0])
+    height, width = first_frame.shape[:2]
+    strip = np.empty((height, width * len(filepaths)) + first_frame.shape[2:], first_frame.dtype)
+    strip[:, 0:width] = first_frame
+
+    def decode_into_strip(index):
+        frame = read_frame(filepaths[index])
+        if frame.shape != first_frame.shape:
+            raise RuntimeError(f"Frame {filepaths[index]} has different size than {filepaths[0]}")
+        strip[:, index * width:(index + 1) * width] = frame
+
+    if len(filepaths) > 1:
+        workers = min(MAX_DECODE_THREADS, os.cpu_count() or 1, len(filepaths) - 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() so exceptions from workers are raised here
+            list(executor.map(decode_into_strip, range(1, len(filepaths))))
+    return strip
+
+def read_image(inputPath):
+    path = Path(f"{inputPath}")
+
+    if path.is_file() == False:
+        return
+
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    return image
+
+def make_all_renders_same_width(render_array):
+    # Shaping different sizes of strips to have same size
+    max_w = 0
+    for py_strip in render_array:
+        strip = np.asarray(deepcopy(py_strip))
+        if strip.shape[1] > max_w:
+            max_w = strip.shape[1]
+    for i, strip in enumerate(render_array):
+        strip =  np.asarray(strip)
+        h, w, d = strip.shape
+        blank = np.zeros((h, max_w, d), strip.dtype)
+        blank[0:h, 0:w] = strip
+        render_array[i] = blank
+
+def create_layouts_from_dict(input_dict, max_file_length, frame_size=None, dedup=False, pack=False):
+    # One layout per output file, shared by image and json so they always agree.
+    # Frame based layouts need frame_size (width, height), with dedup every distinct frame is stored only once,
+    # with pack frames are trimmed to their alpha and packed tightly
+    layouts = {}
+    for file_name in input_dict.keys():
+        if pack:
+            layouts[file_name] = PackedLayout(input_dict[file_name], max_file_length, frame_size[0], frame_size[1], dedup)
+        elif dedup:
+            layouts[file_name] = DedupLayout(input_dict[file_name], max_file_length, frame_size[0], frame_size[1])
+        else:
+            layouts[file_name] = AtlasLayout(input_dict[file_name], max_file_length)
+    return layouts
+
+def create_json_from_dict(input_dict, layouts, bpy_data, scene, rotations, has_fg_bg, affix_filename, output_path, action_data=None):
+    for file_name in input_dict.keys():
+        output_dict = {}
+        output_dict["frame_size_px"] = [0,0]
+        output_dict["frame_size_px"][0] = scene.render.resolution_x
+        output_dict["frame_size_px"][1] = scene.render.resolution_y
+        output_dict["rotations"] = rotations
+        output_dict["has_foreground_and_background"] = has_fg_bg
+        output_dict.update(layouts[file_name].sheet_json())
+        output_dict["data"] = {}
+        for action_name in layouts[file_name].action_names:
+            output_dict["data"][action_name] = {}
+            output_dict["data"][action_name]["animation_length"] = bpy_data.actions[action_name].frame_end
+            output_dict["data"][action_name].update(layouts[file_name].action_json(action_name))
+            if action_data != None and action_name in action_data.keys():
+                output_dict["data"][action_name].update(action_data[action_name])
+        out_file_name = str(file_name) + affix_filename + ".json"
+        output_json = os.path.join(output_path, out_file_name)
+        with open(output_json, 'w') as fp:
+            json.dump(output_dict, fp, indent=4)
+
+def create_images_from_dict(input_dict, layouts, affix_filename, output_path, stream=False):
+    # With stream sheets are written band by band and never exist whole in memory
+    for file_name in input_dict.keys():
+        out_file_name = str(file_name) + affix_filename
+        layout = layouts[file_name]
+        if stream and layout.width > 0 and layout.height > 0:
+            write_layout_png(os.path.join(output_path, out_file_name), layout, input_dict[file_name])
+            continue
+        final_image = layout.compose(input_dict[file_name])
+        cv2.imwrite(os.path.join(output_path, out_file_name), final_image)
+    
+def extend_image_with_blank_to_size(image, desired_size):
+    strip =  np.asarray(image)
+    height, width, d = strip.shape
+    blank = np.zeros((desired_size[0], desired_size[1], desired_size[2]), strip.dtype)
+    blank[0:height, 0:width] = strip
+    image = blank
+    return deepcopy(image)
@@ -0,0 +1,166 @@
+import bpy
+import os
+
+# ------------------------------------------------------------------------
+#   Render stages as view layers
+# ------------------------------------------------------------------------
+#
+# Geometry node toggles are global, a view layer can't see different values of them.
+# So for every stage geometry of node driven objects is baked to plain meshes with that stage toggled on,
+# every stage gets a collection with its baked meshes plus all other renderable objects and a view layer
+# showing only that collection. One render call renders all stage view layers and compositor
+# File Output node writes every layer to its own PNG.
+# Baking keeps only the mesh of an object, so stages where geometry nodes output instances, curves
+# or point clouds raise StageSplitUnsupported and have to be rendered separately.
+
+STAGE_PREFIX = "EMET_STAGE_"
+
+
+def has_geometry_nodes(obj):
+    return any(x.type == 'NODES' for x in obj.modifiers)
+
+
+def _renderable_objects(layer_collection, objects):
+    # Objects the view layer renders, collections excluded or disabled in renders are skipped
+    if layer_collection.exclude or layer_collection.collection.hide_render:
+        return
+    for obj in layer_collection.collection.objects:
+        if not obj.hide_render:
+            objects[obj.name_full] = obj
+    for child in layer_collection.children:
+        _renderable_objects(child, objects)
+
+
+class StageSplitUnsupported(Exception):
+    pass
+
+
+def _instancing_objects(depsgraph, node_objects):
+    # Instances and non mesh geometry of evaluated objects show up in depsgraph as instances of them
+    names = {x.name_full for x in node_objects}
+    return sorted({x.parent.original.name for x in depsgraph.object_instances if x.is_instance and x.parent != None and x.parent.original.name_full in names})
+
+
+def is_stage_split_supported(scene):
+    # Objects placed directly in scene collection are visible in every view layer
+    return not any(has_geometry_nodes(x) for x in scene.collection.objects if not x.hide_render)
+
+
+class StageLayers:
+    """
+    Sets up one view layer per stage, stages is dictionary of stage name to its geometry node toggle label.
+    render() writes every stage to output_paths[stage], teardown() removes everything that was created.
+    """
+
+    def __init__(self, scene, view_layer, node_toggles, stages, output_directory):
+        self.scene = scene
+        self.node_toggles = node_toggles
+        self.stages = stages
+        self.output_directory = output_directory
+        self.output_paths = {}
+        self.collections = []
+        self.view_layers = []
+        self.baked_meshes = []
+        self.baked_objects = []
+        self.created_nodes = []
+        self.previous_use_nodes = scene.use_nodes
+        self.previous_layer_use = {x.name: x.use for x in scene.view_layers}
+
+        try:
+            objects = {}
+            _renderable_objects(view_layer.layer_collection, objects)
+            node_objects = [x for x in objects.values() if has_geometry_nodes(x)]
+            plain_objects = [x for x in objects.values() if x not in node_objects and x.name_full not in scene.collection.objects.keys()]
+
+            all_disabled = {x: False for x in stages.values()}
+            for stage, toggle in stages.items():
+                collection = bpy.data.collections.new(STAGE_PREFIX + stage)
+                scene.collection.children.link(collection)
+                self.collections.append(collection)
+                for obj in plain_objects:
+                    collection.objects.link(obj)
+
+                self.node_toggles.set_many({**all_disabled, toggle: True})
+                depsgraph = bpy.context.evaluated_depsgraph_get()
+                depsgraph.update()
+                instancing = _instancing_objects(depsgraph, node_objects)
+                if len(instancing) > 0:
+                    raise StageSplitUnsupported(f"Geometry nodes of {', '.join(instancing)} output instances or non mesh geometry in {stage} stage, which can't be baked to meshes")
+                for obj in node_objects:
+                    mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph)
+                    self.baked_meshes.append(mesh)
+                    baked = bpy.data.objects.new(STAGE_PREFIX + stage + "_" + obj.name, mesh)
+                    baked.matrix_world = obj.matrix_world
+                    baked.is_holdout = obj.is_holdout
+                    baked.visible_shadow = obj.visible_shadow
+                    self.baked_objects.append(baked)
+                    collection.objects.link(baked)
+            self.node_toggles.set_many(all_disabled)
+
+            for stage, collection in zip(stages.keys(), self.collections):
+                layer = scene.view_layers.new(STAGE_PREFIX + stage)
+                self.view_layers.append(layer)
+                for layer_collection in layer.layer_collection.children:
+                    layer_collection.exclude = layer_collection.collection != collection
+            for layer in scene.view_layers:
+                layer.use = layer in self.view_layers
+
+            self._setup_compositor()
+        except:
+            # Half built setup would stay in the file otherwise
+            self.teardown()
+            raise
+
+    def _setup_compositor(self):
+        scene = self.scene
+        scene.use_nodes = True
+        tree = scene.node_tree
+        if not any(x.type == 'COMPOSITE' for x in tree.nodes):
+            # Without composite output compositor is not executed at all
+            composite = tree.nodes.new('CompositorNodeComposite')
+            self.created_nodes.append(composite)
+
+        file_output = tree.nodes.new('CompositorNodeOutputFile')
+        self.created_nodes.append(file_output)
+        file_output.base_path = self.output_directory
+        file_output.format.file_format = scene.render.image_settings.file_format
+        file_output.format.color_mode = scene.render.image_settings.color_mode
+        file_output.format.color_depth = scene.render.image_settings.color_depth
+        file_output.file_slots.clear()
+        for stage, layer in zip(self.stages.keys(), self.view_layers):
+            render_layers = tree.nodes.new('CompositorNodeRLayers')
+            self.created_nodes.append(render_layers)
+            render_layers.layer = layer.name
+            file_output.file_slots.new(STAGE_PREFIX + stage)
+            tree.links.new(render_layers.outputs['Image'], file_output.inputs[-1])
+            # File Output node always appends frame number
+            self.output_paths[stage] = os.path.join(self.output_directory, f"{STAGE_PREFIX}{stage}{self.scene.frame_current:04}{self.scene.render.file_extension}")
+
+    def render(self):
+        bpy.ops.render.render(animation=False, write_still=False, use_viewport=False, layer='', scene='')
+        missing = [x for x in self.output_paths.values() if not os.path.exists(x)]
+        if len(missing) > 0:
+            raise RuntimeError(f"Stage render didn't write: {', '.join(missing)}")
+        return self.output_paths
+
+    def teardown(self):
+        tree = self.scene.node_tree
+        for node in self.created_nodes:
+            tree.nodes.remove(node)
+        self.created_nodes = []
+        self.scene.use_nodes = self.previous_use_nodes
+        for layer in self.scene.view_layers:
+            if layer.name in self.previous_layer_use.keys():
+                layer.use = self.previous_layer_use[layer.name]
+        for layer in self.view_layers:
+            self.scene.view_layers.remove(layer)
+        for obj in self.baked_objects:
+            bpy.data.objects.remove(obj)
+        for mesh in self.baked_meshes:
+            bpy.data.meshes.remove(mesh)
+        for collection in self.collections:
+            bpy.data.collections.remove(collection)
+        self.view_layers = []
+        self.baked_objects = []
+        self.baked_meshes = []
+        self.collections = []
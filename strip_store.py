@@ -0,0 +1,116 @@
+import numpy as np
+import os
+import threading
+import weakref
+
+# ------------------------------------------------------------------------
+#   Per action strip buffers
+# ------------------------------------------------------------------------
+
+SPILL_PREFIX = "spill_strip_"
+
+
+class StripMemoryBudget:
+    """
+    Bytes of strips all stores together keep in RAM. Strips allocated once budget is used up are
+    np.memmap files in spill_directory, their pages are written out to disk instead of growing
+    the process memory. Shared by every StripStore of one render, strips give their bytes back
+    once they are garbage collected, which can happen on post processing thread.
+    """
+
+    def __init__(self, max_bytes, spill_directory):
+        self.max_bytes = max_bytes
+        self.spill_directory = spill_directory
+        self.used_bytes = 0
+        self.spilled_paths = []
+        self.lock = threading.Lock()
+
+    def _free(self, size):
+        with self.lock:
+            self.used_bytes -= size
+
+    def allocate(self, shape, dtype):
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with self.lock:
+            fits = self.used_bytes + size <= self.max_bytes
+            if fits:
+                self.used_bytes += size
+        if fits:
+            strip = np.zeros(shape, dtype)
+            weakref.finalize(strip, self._free, size)
+            return strip
+        path = os.path.join(self.spill_directory, f"{SPILL_PREFIX}{len(self.spilled_paths)}.dat")
+        self.spilled_paths.append(path)
+        # New file reads as zeros, same as np.zeros
+        return np.memmap(path, dtype, mode="w+", shape=shape)
+
+    def release(self):
+        # Stores have to be dropped before, Windows keeps mapped files locked
+        for path in self.spilled_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.spilled_paths = []
+
+class StripStore:
+    """
+    Keeps strips of every action for every output file. Strip of an action is allocated once,
+    when its first row arrives, with room for all row_count rows (rotations times render passes).
+    Every next row is written in place instead of concatenating whole strip again.
+    Rows can be written from render and post processing threads at the same time.
+    """
+
+    def __init__(self, row_count, name="", budget=None):
+        self.row_count = row_count
+        # Identifies the store in job checkpoints
+        self.name = name
+        # StripMemoryBudget deciding which strips are kept in RAM, all of them without it
+        self.budget = budget
+        # Key is file name, value is dictionary of action name to strip
+        self.strips = {}
+        # Two threads allocating strip of the same action would each keep only their own row
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.strips)
+
+    def row(self, file_name, action_name, row_index, row_height, row_width, depth=4, dtype=np.uint8):
+        # Returns view of the strip that given row should be written into
+        if row_index < 0 or row_index >= self.row_count:
+            raise IndexError(f"Row {row_index} out of range for strip with {self.row_count} rows")
+        with self.lock:
+            if file_name not in self.strips.keys():
+                self.strips[file_name] = {}
+            actions = self.strips[file_name]
+            if action_name not in actions.keys():
+                shape = (self.row_count * row_height, row_width, depth)
+                actions[action_name] = self.budget.allocate(shape, dtype) if self.budget != None else np.zeros(shape, dtype)
+            strip = actions[action_name]
+        if strip.shape[0] != self.row_count * row_height or strip.shape[1] < row_width or strip.shape[2] != depth:
+            raise ValueError(f"Row of size {row_width}x{row_height}x{depth} does not fit strip of {file_name} {action_name} with shape {strip.shape}")
+        return strip[row_index * row_height:(row_index + 1) * row_height, 0:row_width]
+
+    def write(self, file_name, action_name, row_index, hstrip):
+        hstrip = np.asarray(hstrip)
+        if hstrip.ndim == 2:
+            hstrip = hstrip[:, :, np.newaxis]
+        height, width, depth = hstrip.shape
+        self.row(file_name, action_name, row_index, height, width, depth, hstrip.dtype)[...] = hstrip
+
+    def has_row(self, file_name, action_name):
+        return file_name in self.strips.keys() and action_name in self.strips[file_name].keys()
+
+    def get_row(self, file_name, action_name, row_index):
+        strip = self.strips[file_name][action_name]
+        row_height = strip.shape[0] // self.row_count
+        return strip[row_index * row_height:(row_index + 1) * row_height]
+
+    def mirror_row(self, file_name, action_name, source_row, target_row, frame_width):
+        # Every frame of source row flipped horizontally into target row, frame order stays the same
+        strip = self.strips[file_name][action_name]
+        row_height = strip.shape[0] // self.row_count
+        depth = strip.shape[2]
+        source = strip[source_row * row_height:(source_row + 1) * row_height]
+        frames = source.reshape(row_height, -1, frame_width, depth)
+        strip[target_row * row_height:(target_row + 1) * row_height] = frames[:, :, ::-1].reshape(row_height, -1, depth)
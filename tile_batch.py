@@ -0,0 +1,125 @@
+import numpy as np
+
+# ------------------------------------------------------------------------
+#   Batch tile render
+# ------------------------------------------------------------------------
+#
+# With orthographic camera moving camera by tile location is the same as shifting the image,
+# so all tiles can be rendered in one big frame around their existing placement and sliced out.
+
+# Bigger frames are split, very large renders need a lot of memory and can hit GPU limits
+MAX_BATCH_FRAME_PX = 8192
+# Tile offsets have to land on whole pixels, otherwise slices differ from separate renders
+PIXEL_TOLERANCE = 0.01
+
+
+def tile_frame_size(scene):
+    width = int(scene.render.resolution_x * scene.render.resolution_percentage / 100)
+    height = int(scene.render.resolution_y * scene.render.resolution_percentage / 100)
+    return width, height
+
+
+def is_batch_supported(scene, camera):
+    if camera.data.type != 'ORTHO' or camera.data.sensor_fit != 'AUTO':
+        return False
+    return scene.render.pixel_aspect_x == scene.render.pixel_aspect_y
+
+
+def tile_pixel_offsets(scene, camera, locations):
+    """
+    Pixel offset (right, up) of every tile image from the image camera renders without moving,
+    locations are XY offsets camera would be moved by for separate tile renders.
+    Returns None when some offset is not whole pixels.
+    """
+    width, height = tile_frame_size(scene)
+    pixels_per_unit = max(width, height) / camera.data.ortho_scale
+    rotation = np.array(camera.matrix_world.to_3x3())
+    right = rotation[:, 0]
+    up = rotation[:, 1]
+    offsets = []
+    for x, y in locations:
+        location = np.array([x, y, 0.0])
+        offset = np.array([location @ right, location @ up]) * pixels_per_unit
+        rounded = np.round(offset)
+        if np.any(np.abs(offset - rounded) > PIXEL_TOLERANCE):
+            return None
+        offsets.append((int(rounded[0]), int(rounded[1])))
+    return offsets
+
+
+def group_tiles(offsets, width, height, max_px=MAX_BATCH_FRAME_PX):
+    # Consecutive tiles go to one frame as long as the frame covering them stays under max_px
+    groups = []
+    current = []
+    bounds = None
+    for index, (x, y) in enumerate(offsets):
+        if bounds == None:
+            candidate = (x, x, y, y)
+        else:
+            candidate = (min(bounds[0], x), max(bounds[1], x), min(bounds[2], y), max(bounds[3], y))
+        if len(current) > 0 and (candidate[1] - candidate[0] + width > max_px or candidate[3] - candidate[2] + height > max_px):
+            groups.append(current)
+            current = []
+            candidate = (x, x, y, y)
+        current.append(index)
+        bounds = candidate
+    if len(current) > 0:
+        groups.append(current)
+    return groups
+
+
+def has_overlapping_tiles(offsets, width, height):
+    # Tiles closer than one frame would appear in each other's slice
+    for i, (x1, y1) in enumerate(offsets):
+        for x2, y2 in offsets[i + 1:]:
+            if abs(x1 - x2) < width and abs(y1 - y2) < height:
+                return True
+    return False
+
+
+class BatchFrame:
+    """
+    Enlarges render resolution and orthographic scale of the camera, keeping pixel size,
+    so one frame covers given tile offsets. restore() puts original settings back.
+    """
+
+    def __init__(self, scene, camera, offsets):
+        self.scene = scene
+        self.camera = camera
+        self.tile_width, self.tile_height = tile_frame_size(scene)
+        self.saved = (scene.render.resolution_x, scene.render.resolution_y, scene.render.resolution_percentage,
+                      camera.data.ortho_scale, camera.data.shift_x, camera.data.shift_y)
+
+        xs = [x[0] for x in offsets]
+        ys = [x[1] for x in offsets]
+        self.min_x = min(xs)
+        self.max_y = max(ys)
+        self.width = max(xs) - self.min_x + self.tile_width
+        self.height = self.max_y - min(ys) + self.tile_height
+        # Frame center relative to center of unmoved camera frame, in pixels
+        center_x = (self.min_x + max(xs)) / 2
+        center_y = (min(ys) + self.max_y) / 2
+
+        tile_size = max(self.tile_width, self.tile_height)
+        frame_size = max(self.width, self.height)
+        # Camera shift is measured in fractions of the bigger frame dimension
+        shift_x = camera.data.shift_x * tile_size + center_x
+        shift_y = camera.data.shift_y * tile_size + center_y
+
+        scene.render.resolution_x = self.width
+        scene.render.resolution_y = self.height
+        scene.render.resolution_percentage = 100
+        camera.data.ortho_scale = camera.data.ortho_scale * frame_size / tile_size
+        camera.data.shift_x = shift_x / frame_size
+        camera.data.shift_y = shift_y / frame_size
+
+    def slice(self, frame, offset):
+        # Frame rows go top to bottom, offsets go up
+        x = offset[0] - self.min_x
+        y = self.max_y - offset[1]
+        return frame[y:y + self.tile_height, x:x + self.tile_width]
+
+    def restore(self):
+        render = self.scene.render
+        data = self.camera.data
+        render.resolution_x, render.resolution_y, render.resolution_percentage, data.ortho_scale, data.shift_x, data.shift_y = self.saved
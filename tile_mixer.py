@@ -33,6 +33,12 @@ class TilesMixerProperties(bpy.types.PropertyGroup):
         subtype='NONE'
     )
 
+    use_batch_render: bpy.props.BoolProperty(
+        name="Render Tiles In One Frame",
+        description="Render all tiles at their placement in one big frame and slice them out. Needs orthographic camera and tiles placed on whole pixels, geometry sticking out of a tile shows up in its neighbours",
+        default=False
+    )
+
 
 class TilesMixerPanel(bpy.types.Panel):
     bl_label = "Tiles Mixer Panel"
@@ -52,6 +58,7 @@ class TilesMixerPanel(bpy.types.Panel):
         layout.prop(TileMixer, "foreground_affix", text="")
         layout.label(text="Background object affix")
         layout.prop(TileMixer, "background_affix", text="")
+        layout.prop(TileMixer, "use_batch_render")
 
 class TileMixerNodeOperator(bpy.types.Operator):
     bl_idname = "tile_mixer.operator"
@@ -0,0 +1,131 @@
+import bpy
+
+# ------------------------------------------------------------------------
+#   Visibility through view layers
+# ------------------------------------------------------------------------
+#
+# Every (shown object, character holdout) state animation render needs gets its own view layer,
+# built once. Switching state is then only switching which view layer is rendered, objects keep
+# their transforms and nothing has to be re-evaluated. Objects are shown through their own collection,
+# collections they normally live in (props, wearables) are excluded in every layer.
+
+VISIBILITY_PREFIX = "EMET_VISIBILITY_"
+
+
+def _copy_rna_properties(source, target, skip=()):
+    for prop in source.bl_rna.properties:
+        if prop.identifier in skip or prop.is_readonly or prop.type in ('POINTER', 'COLLECTION'):
+            continue
+        try:
+            setattr(target, prop.identifier, getattr(source, prop.identifier))
+        except (AttributeError, TypeError, ValueError):
+            pass
+
+
+def _copy_layer_collection_flags(source, target):
+    target.exclude = source.exclude
+    target.holdout = source.holdout
+    target.indirect_only = source.indirect_only
+    children = {x.collection.name_full: x for x in target.children}
+    for child in source.children:
+        if child.collection.name_full in children.keys():
+            _copy_layer_collection_flags(child, children[child.collection.name_full])
+
+
+def _find_layer_collection(layer_collection, collection):
+    if layer_collection.collection == collection:
+        return layer_collection
+    for child in layer_collection.children:
+        found = _find_layer_collection(child, collection)
+        if found != None:
+            return found
+    return None
+
+
+class VisibilityLayers:
+    """
+    states are (visible, holdout) pairs, visible is a key of visible_objects or None.
+    visible_objects maps key to (object, collection it normally lives in),
+    holdout_objects are objects made holdout in states that have holdout set.
+    """
+
+    def __init__(self, scene, view_layer, holdout_objects, visible_objects, states):
+        self.scene = scene
+        self.layers = {}
+        self.collections = []
+        self.previous_layer_use = {x.name: x.use for x in scene.view_layers}
+        self.previous_hide_render = [(x[0], x[0].hide_render) for x in visible_objects.values()]
+        self.retargeted_nodes = []
+
+        try:
+            # Character meshes are holdout through this collection
+            holdout_collection = self._new_collection("holdout")
+            for obj in holdout_objects:
+                holdout_collection.objects.link(obj)
+            object_collections = {}
+            for key, (obj, _) in visible_objects.items():
+                object_collections[key] = self._new_collection(obj.name)
+                object_collections[key].objects.link(obj)
+                obj.hide_render = False
+            home_collections = set(x[1] for x in visible_objects.values() if x[1] != None)
+
+            for index, (visible, holdout) in enumerate(states):
+                layer = scene.view_layers.new(f"{VISIBILITY_PREFIX}{index}")
+                _copy_rna_properties(view_layer, layer, skip=("name", "use"))
+                for override in ("material_override", "world_override"):
+                    if hasattr(view_layer, override):
+                        setattr(layer, override, getattr(view_layer, override))
+                if hasattr(view_layer, "cycles"):
+                    _copy_rna_properties(view_layer.cycles, layer.cycles)
+                _copy_layer_collection_flags(view_layer.layer_collection, layer.layer_collection)
+                for collection in home_collections:
+                    layer_collection = _find_layer_collection(layer.layer_collection, collection)
+                    if layer_collection != None:
+                        layer_collection.exclude = True
+                for key, collection in object_collections.items():
+                    _find_layer_collection(layer.layer_collection, collection).exclude = key != visible
+                _find_layer_collection(layer.layer_collection, holdout_collection).holdout = holdout
+                self.layers[(visible, holdout)] = layer
+        except:
+            self.teardown()
+            raise
+
+    def _new_collection(self, name):
+        collection = bpy.data.collections.new(VISIBILITY_PREFIX + name)
+        self.scene.collection.children.link(collection)
+        self.collections.append(collection)
+        return collection
+
+    def activate(self, visible, holdout):
+        active = self.layers[(visible, holdout)]
+        for layer in self.scene.view_layers:
+            layer.use = layer == active
+        # Compositor has to read the layer that is rendered
+        if self.scene.use_nodes and self.scene.node_tree != None:
+            for node in self.scene.node_tree.nodes:
+                if node.type != 'R_LAYERS' or node.layer == active.name:
+                    continue
+                if not any(x[0] == node for x in self.retargeted_nodes):
+                    self.retargeted_nodes.append((node, node.layer))
+                node.layer = active.name
+
+    def teardown(self):
+        for node, layer_name in self.retargeted_nodes:
+            try:
+                node.layer = layer_name
+            except ReferenceError:
+                # Node was removed together with frame capture
+                pass
+        self.retargeted_nodes = []
+        for layer in self.scene.view_layers:
+            if layer.name in self.previous_layer_use.keys():
+                layer.use = self.previous_layer_use[layer.name]
+        for layer in self.layers.values():
+            self.scene.view_layers.remove(layer)
+        self.layers = {}
+        for collection in self.collections:
+            bpy.data.collections.remove(collection)
+        self.collections = []
+        for obj, hide_render in self.previous_hide_render:
+            obj.hide_render = hide_render
+        self.previous_hide_render = []